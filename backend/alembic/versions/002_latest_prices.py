@@ -0,0 +1,52 @@
+"""Composite price index and latest prices table
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The composite index serves every symbol lookup, so the single-column one is redundant
+    op.create_index(
+        'ix_price_snapshots_symbol_type_timestamp',
+        'price_snapshots',
+        ['symbol', 'asset_type', sa.text('"timestamp" DESC')],
+        unique=False
+    )
+    op.drop_index(op.f('ix_price_snapshots_symbol'), table_name='price_snapshots')
+    
+    op.create_table('latest_prices',
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('asset_type', sa.String(), nullable=False),
+    sa.Column('price', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('symbol', 'asset_type')
+    )
+    
+    # Backfill from the newest snapshot of every (symbol, asset_type)
+    op.execute("""
+        INSERT INTO latest_prices (symbol, asset_type, price, currency, "timestamp", source)
+        SELECT DISTINCT ON (symbol, asset_type)
+            symbol, asset_type, price, currency, "timestamp", source
+        FROM price_snapshots
+        WHERE "timestamp" IS NOT NULL
+        ORDER BY symbol, asset_type, "timestamp" DESC, id DESC
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('latest_prices')
+    op.create_index(op.f('ix_price_snapshots_symbol'), 'price_snapshots', ['symbol'], unique=False)
+    op.drop_index('ix_price_snapshots_symbol_type_timestamp', table_name='price_snapshots')
@@ -0,0 +1,31 @@
+"""Valuation dirty users
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('valuation_dirty_users',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('marked_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    
+    # Value everyone on the first incremental run
+    op.execute("INSERT INTO valuation_dirty_users (user_id, marked_at) SELECT id, now() FROM users")
+
+
+def downgrade() -> None:
+    op.drop_table('valuation_dirty_users')
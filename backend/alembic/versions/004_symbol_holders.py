@@ -0,0 +1,39 @@
+"""Symbol holders reverse index
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('symbol_holders',
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('asset_type', sa.String(), nullable=False),
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('symbol', 'asset_type', 'portfolio_id')
+    )
+    op.create_index('ix_symbol_holders_portfolio_id', 'symbol_holders', ['portfolio_id'], unique=False)
+    
+    op.execute("""
+        INSERT INTO symbol_holders (symbol, asset_type, portfolio_id, user_id)
+        SELECT DISTINCT assets.symbol, assets.asset_type, assets.portfolio_id, portfolios.user_id
+        FROM assets JOIN portfolios ON portfolios.id = assets.portfolio_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_symbol_holders_portfolio_id', table_name='symbol_holders')
+    op.drop_table('symbol_holders')
@@ -0,0 +1,28 @@
+"""Net worth snapshot (user_id, timestamp) index
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_networth_snapshots_user_id_timestamp',
+        'networth_snapshots',
+        ['user_id', 'timestamp'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_networth_snapshots_user_id_timestamp', table_name='networth_snapshots')
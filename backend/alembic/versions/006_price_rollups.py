@@ -0,0 +1,56 @@
+"""Hourly and daily price rollups
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('price_rollups',
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('asset_type', sa.String(), nullable=False),
+    sa.Column('interval', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('open', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('high', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('low', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('close', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('close_timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('symbol', 'asset_type', 'interval', 'bucket_start')
+    )
+    
+    # Backfill both intervals from the raw snapshots
+    for interval in ('hour', 'day'):
+        op.execute(f"""
+            INSERT INTO price_rollups
+                (symbol, asset_type, interval, bucket_start, open, high, low, close, close_timestamp, sample_count)
+            SELECT
+                symbol,
+                asset_type,
+                '{interval}',
+                date_trunc('{interval}', "timestamp"),
+                (array_agg(price ORDER BY "timestamp", id))[1],
+                max(price),
+                min(price),
+                (array_agg(price ORDER BY "timestamp" DESC, id DESC))[1],
+                max("timestamp"),
+                count(*)
+            FROM price_snapshots
+            WHERE "timestamp" IS NOT NULL
+            GROUP BY symbol, asset_type, date_trunc('{interval}', "timestamp")
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('price_rollups')
@@ -0,0 +1,102 @@
+"""Partition price and net worth snapshots by month
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import date
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+# Months of partitions created past the current one; the retention job keeps this topped up
+MONTHS_AHEAD = 3
+
+# Indexes recreated on each partitioned parent (and so on every partition)
+INDEXES = {
+    'price_snapshots': [
+        ('ix_price_snapshots_id', ['id']),
+        ('ix_price_snapshots_symbol_type_timestamp', ['symbol', 'asset_type', sa.text('"timestamp" DESC')]),
+    ],
+    'networth_snapshots': [
+        ('ix_networth_snapshots_id', ['id']),
+        ('ix_networth_snapshots_user_id_timestamp', ['user_id', 'timestamp']),
+    ],
+}
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(table: str):
+    """Months from the oldest stored row through MONTHS_AHEAD past the current month"""
+    oldest = op.get_bind().execute(sa.text(f'SELECT min("timestamp") FROM {table}_unpartitioned')).scalar()
+    current = date.today().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest else current
+    while month <= add_months(current, MONTHS_AHEAD):
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_table(table: str) -> None:
+    op.execute(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned')
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {table}_unpartitioned_pkey')
+    op.execute(f'UPDATE {table}_unpartitioned SET "timestamp" = now() WHERE "timestamp" IS NULL')
+    op.execute(f"""
+        CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS)
+        PARTITION BY RANGE ("timestamp")
+    """)
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN "timestamp" SET NOT NULL')
+    # The partition key must be part of the primary key
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "timestamp")')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    
+    for month in month_range(table):
+        op.execute(f"""
+            CREATE TABLE {table}_{month:%Y%m} PARTITION OF {table}
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')
+        """)
+    # Catches rows past the last monthly partition, so inserts never fail if partition upkeep falls behind
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    
+    op.execute(f'INSERT INTO {table} SELECT * FROM {table}_unpartitioned')
+    op.execute(f'DROP TABLE {table}_unpartitioned')
+    for name, columns in INDEXES[table]:
+        op.create_index(name, table, columns, unique=False)
+
+
+def unpartition_table(table: str) -> None:
+    op.execute(f'ALTER TABLE {table} RENAME TO {table}_partitioned')
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {table}_partitioned_pkey')
+    op.execute(f'CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS)')
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {table}_partitioned')
+    # Dropping the parent drops every partition with it
+    op.execute(f'DROP TABLE {table}_partitioned')
+    for name, columns in INDEXES[table]:
+        op.create_index(name, table, columns, unique=False)
+
+
+def upgrade() -> None:
+    partition_table('price_snapshots')
+    partition_table('networth_snapshots')
+    op.create_foreign_key(
+        'networth_snapshots_user_id_fkey', 'networth_snapshots', 'users', ['user_id'], ['id']
+    )
+
+
+def downgrade() -> None:
+    unpartition_table('networth_snapshots')
+    op.create_foreign_key(
+        'networth_snapshots_user_id_fkey', 'networth_snapshots', 'users', ['user_id'], ['id']
+    )
+    unpartition_table('price_snapshots')
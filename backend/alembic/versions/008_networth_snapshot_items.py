@@ -0,0 +1,45 @@
+"""Normalized net worth snapshot items
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('networth_snapshot_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('snapshot_id', sa.Integer(), nullable=False),
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.DECIMAL(precision=20, scale=8), nullable=True),
+    sa.Column('price', sa.DECIMAL(precision=20, scale=8), nullable=True),
+    sa.Column('value', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_networth_snapshot_items_snapshot_id', 'networth_snapshot_items', ['snapshot_id'], unique=False)
+    
+    # Existing snapshots keep their JSON breakdown; new ones leave it NULL
+    op.alter_column('networth_snapshots', 'portfolio_breakdown', nullable=True)
+    op.add_column('networth_snapshots', sa.Column('breakdown_snapshot_id', sa.Integer(), nullable=True))
+    op.create_index(
+        'ix_networth_snapshots_breakdown_snapshot_id', 'networth_snapshots', ['breakdown_snapshot_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_networth_snapshots_breakdown_snapshot_id', table_name='networth_snapshots')
+    op.drop_column('networth_snapshots', 'breakdown_snapshot_id')
+    op.execute("UPDATE networth_snapshots SET portfolio_breakdown = '{}' WHERE portfolio_breakdown IS NULL")
+    op.alter_column('networth_snapshots', 'portfolio_breakdown', nullable=False)
+    op.drop_index('ix_networth_snapshot_items_snapshot_id', table_name='networth_snapshot_items')
+    op.drop_table('networth_snapshot_items')
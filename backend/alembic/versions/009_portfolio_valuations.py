@@ -0,0 +1,79 @@
+"""Precomputed portfolio valuations
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timezone
+from decimal import Decimal
+from utils.encryption import encryption
+import logging
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+# Shares alembic's configured handler, so skipped assets show in the migration output
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade() -> None:
+    portfolio_valuations = op.create_table('portfolio_valuations',
+    sa.Column('portfolio_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('asset_count', sa.Integer(), nullable=False),
+    sa.Column('cost_basis', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('current_value', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('gain_loss', sa.DECIMAL(precision=20, scale=8), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('portfolio_id')
+    )
+    op.create_index('ix_portfolio_valuations_user_id', 'portfolio_valuations', ['user_id'], unique=False)
+    
+    # Cost basis needs decrypted purchase prices, so the backfill runs here rather than in SQL
+    now = datetime.now(timezone.utc)
+    rows = {}
+    result = op.get_bind().execution_options(yield_per=1000).execute(sa.text("""
+        SELECT portfolios.id AS portfolio_id, portfolios.user_id, assets.id AS asset_id,
+               assets.quantity, assets.purchase_price_encrypted, latest_prices.price
+        FROM portfolios
+        LEFT JOIN assets ON assets.portfolio_id = portfolios.id
+        LEFT JOIN latest_prices
+            ON latest_prices.symbol = assets.symbol AND latest_prices.asset_type = assets.asset_type
+    """))
+    for row in result:
+        totals = rows.setdefault(row.portfolio_id, {
+            'portfolio_id': row.portfolio_id,
+            'user_id': row.user_id,
+            'asset_count': 0,
+            'cost_basis': Decimal('0'),
+            'current_value': Decimal('0'),
+            'updated_at': now
+        })
+        if row.asset_id is None:
+            continue
+        totals['asset_count'] += 1
+        try:
+            totals['cost_basis'] += row.quantity * Decimal(encryption.decrypt(row.purchase_price_encrypted))
+        except Exception as e:
+            # Counted at zero cost, as ValuationService does
+            logger.error(f"Error decrypting purchase price for asset {row.asset_id}: {e}")
+        if row.price is not None:
+            totals['current_value'] += row.quantity * row.price
+    
+    for totals in rows.values():
+        totals['gain_loss'] = totals['current_value'] - totals['cost_basis']
+    if rows:
+        op.bulk_insert(portfolio_valuations, list(rows.values()))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_portfolio_valuations_user_id', table_name='portfolio_valuations')
+    op.drop_table('portfolio_valuations')
@@ -0,0 +1,39 @@
+"""Store portfolio names and asset symbols on net worth snapshot items
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('networth_snapshot_items', sa.Column('portfolio_name', sa.String(), nullable=True))
+    op.add_column('networth_snapshot_items', sa.Column('symbol', sa.String(), nullable=True))
+    op.add_column('networth_snapshot_items', sa.Column('asset_type', sa.String(), nullable=True))
+    
+    # Backfill from the live rows; portfolios already deleted keep the placeholder the reader used to show
+    op.execute("""
+        UPDATE networth_snapshot_items SET
+            portfolio_name = COALESCE(
+                (SELECT portfolios.name FROM portfolios WHERE portfolios.id = networth_snapshot_items.portfolio_id),
+                'Portfolio ' || networth_snapshot_items.portfolio_id
+            ),
+            symbol = (SELECT assets.symbol FROM assets WHERE assets.id = networth_snapshot_items.asset_id),
+            asset_type = (SELECT assets.asset_type FROM assets WHERE assets.id = networth_snapshot_items.asset_id)
+    """)
+    op.alter_column('networth_snapshot_items', 'portfolio_name', nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column('networth_snapshot_items', 'asset_type')
+    op.drop_column('networth_snapshot_items', 'symbol')
+    op.drop_column('networth_snapshot_items', 'portfolio_name')
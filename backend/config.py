@@ -7,6 +7,10 @@ import os
 class Settings(BaseSettings):
     # Database
     database_url: str
+    # asyncpg URL for request handlers; derived from database_url when unset
+    async_database_url: Optional[str] = None
+    database_pool_size: int = 10
+    database_max_overflow: int = 20
     
     # JWT
     jwt_secret_key: str
@@ -15,11 +19,50 @@ class Settings(BaseSettings):
     
     # AES Encryption
     aes_encryption_key: str
+    decrypt_cache_max_size: int = 50000
+    reencrypt_batch_size: int = 1000
     
     # API Keys
     alpha_vantage_api_key: str
     coingecko_api_key: Optional[str] = None
     
+    # Price provider HTTP client
+    price_http_timeout_seconds: float = 10.0
+    price_http_max_connections: int = 20
+    alpha_vantage_max_concurrency: int = 1
+    coingecko_max_concurrency: int = 4
+    
+    # Price provider rate limits (token bucket per provider)
+    alpha_vantage_rate_per_second: float = 5 / 60
+    alpha_vantage_burst: int = 5
+    alpha_vantage_daily_quota: Optional[int] = 500
+    coingecko_rate_per_second: float = 0.5
+    coingecko_burst: int = 10
+    coingecko_daily_quota: Optional[int] = None
+    price_max_retries: int = 3
+    price_retry_backoff_seconds: float = 2.0
+    
+    # Nightly valuation
+    valuation_batch_size: int = 1000
+    valuation_workers: int = 1
+    valuation_shard_size: int = 10000
+    
+    # Latest price cache
+    price_cache_max_size: int = 10000
+    price_cache_ttl_seconds: int = 300
+    
+    # Snapshot retention
+    price_snapshot_retention_days: int = 90
+    networth_snapshot_compaction_days: int = 30
+    snapshot_partition_months_ahead: int = 3
+    
+    # Symbol holder reverse index
+    holder_index_refresh_seconds: int = 300
+    
+    # Background exports
+    export_dir: str = "exports"
+    export_job_ttl_seconds: int = 86400
+    
     # CORS
     vite_api_base_url: str = "http://localhost:3000"
     
@@ -1,26 +1,48 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from config import settings
-from routers import auth, portfolios, networth, export, news
+from database import SessionLocal, async_engine
+from routers import auth, portfolios, networth, export, news, prices
 from scheduler.scheduler_service import scheduler_service
+from services.price_service import price_service
+from services.retention_service import retention_service
+from utils.encryption import encryption
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def ensure_snapshot_partitions():
+    """Create this month's and next month's snapshot partitions before any writes"""
+    db = SessionLocal()
+    try:
+        created = retention_service.ensure_current_partitions(db)
+        if created:
+            logger.info(f"Created snapshot partitions: {', '.join(created)}")
+    except Exception as e:
+        logger.error(f"Error creating snapshot partitions: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     logger.info("Starting WealthWise API")
+    await asyncio.to_thread(ensure_snapshot_partitions)
     scheduler_service.start()
     yield
     # Shutdown
     logger.info("Shutting down WealthWise API")
     scheduler_service.shutdown()
+    await price_service.close()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -45,6 +67,7 @@ app.include_router(portfolios.router)
 app.include_router(networth.router)
 app.include_router(export.router)
 app.include_router(news.router)
+app.include_router(prices.router)
 
 
 @app.get("/")
@@ -63,5 +86,8 @@ async def health_check():
     return {
         "status": "healthy",
         "scheduler_running": scheduler_service.scheduler.running,
+        "price_cache": price_service.latest_price_cache.stats(),
+        "price_providers": price_service.rate_limit_status(),
+        "decrypt_cache": encryption.decrypt_cache.stats(),
         "version": settings.app_version
     }
@@ -1,3 +1,3 @@
-from .models import User, Portfolio, Asset, PriceSnapshot, NetWorthSnapshot, News
+from .models import User, Portfolio, Asset, PriceSnapshot, LatestPrice, PriceRollup, PortfolioValue, NetWorthSnapshot, NetWorthSnapshotItem, SymbolHolder, ValuationDirtyUser, ExportJob, News
 
-__all__ = ["User", "Portfolio", "Asset", "PriceSnapshot", "NetWorthSnapshot", "News"]
+__all__ = ["User", "Portfolio", "Asset", "PriceSnapshot", "LatestPrice", "PriceRollup", "PortfolioValue", "NetWorthSnapshot", "NetWorthSnapshotItem", "SymbolHolder", "ValuationDirtyUser", "ExportJob", "News"]
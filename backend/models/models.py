@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, DECIMAL, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, DECIMAL, Boolean, Float, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -53,29 +53,143 @@ class Asset(Base):
 
 class PriceSnapshot(Base):
     __tablename__ = "price_snapshots"
+    __table_args__ = (
+        Index("ix_price_snapshots_symbol_type_timestamp", "symbol", "asset_type", text('"timestamp" DESC')),
+    )
+    # On Postgres the table is partitioned by month on timestamp, with primary key (id, timestamp)
     
     id = Column(Integer, primary_key=True, index=True)
-    symbol = Column(String, nullable=False, index=True)
+    symbol = Column(String, nullable=False)
     asset_type = Column(String, nullable=False)
     price = Column(DECIMAL(20, 8), nullable=False)
     currency = Column(String, default="USD")
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     source = Column(String, nullable=False)  # 'alpha_vantage', 'coingecko'
     metadata = Column(JSONB, nullable=True)
 
 
+class LatestPrice(Base):
+    __tablename__ = "latest_prices"
+    
+    symbol = Column(String, primary_key=True)
+    asset_type = Column(String, primary_key=True)
+    price = Column(DECIMAL(20, 8), nullable=False)
+    currency = Column(String, default="USD")
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    source = Column(String, nullable=False)
+
+
+class PriceRollup(Base):
+    __tablename__ = "price_rollups"
+    
+    # Hourly and daily OHLC per (symbol, asset_type), maintained as prices are stored
+    symbol = Column(String, primary_key=True)
+    asset_type = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)  # 'hour', 'day'
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    open = Column(DECIMAL(20, 8), nullable=False)
+    high = Column(DECIMAL(20, 8), nullable=False)
+    low = Column(DECIMAL(20, 8), nullable=False)
+    close = Column(DECIMAL(20, 8), nullable=False)
+    close_timestamp = Column(DateTime(timezone=True), nullable=False)
+    sample_count = Column(Integer, nullable=False)
+
+
 class NetWorthSnapshot(Base):
     __tablename__ = "networth_snapshots"
+    __table_args__ = (
+        Index("ix_networth_snapshots_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_networth_snapshots_breakdown_snapshot_id", "breakdown_snapshot_id"),
+    )
+    # On Postgres the table is partitioned by month on timestamp, with primary key (id, timestamp)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_value = Column(DECIMAL(20, 2), nullable=False)
-    portfolio_breakdown = Column(JSONB, nullable=False)  # Portfolio-wise breakdown
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    portfolio_breakdown = Column(JSONB, nullable=True)  # Legacy breakdown; newer snapshots store items
+    # Carried-forward snapshots share the items of the snapshot they copy; NULL means their own
+    breakdown_snapshot_id = Column(Integer, nullable=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     user = relationship("User")
 
 
+class NetWorthSnapshotItem(Base):
+    __tablename__ = "networth_snapshot_items"
+    __table_args__ = (
+        Index("ix_networth_snapshot_items_snapshot_id", "snapshot_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # No foreign key: partitioned snapshots are keyed on (id, timestamp)
+    snapshot_id = Column(Integer, nullable=False)
+    portfolio_id = Column(Integer, nullable=False)
+    asset_id = Column(Integer, nullable=True)  # NULL for the portfolio total
+    # Copied at snapshot time so history survives portfolio renames and deletions
+    portfolio_name = Column(String, nullable=False)
+    symbol = Column(String, nullable=True)
+    asset_type = Column(String, nullable=True)
+    quantity = Column(DECIMAL(20, 8), nullable=True)
+    price = Column(DECIMAL(20, 8), nullable=True)
+    value = Column(DECIMAL(20, 8), nullable=False)
+
+
+class PortfolioValue(Base):
+    __tablename__ = "portfolio_valuations"
+    __table_args__ = (
+        Index("ix_portfolio_valuations_user_id", "user_id"),
+    )
+    
+    # Kept current on write: cost basis as assets change, current value as prices land
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    asset_count = Column(Integer, nullable=False, default=0)
+    cost_basis = Column(DECIMAL(20, 8), nullable=False, default=0)
+    current_value = Column(DECIMAL(20, 8), nullable=False, default=0)
+    gain_loss = Column(DECIMAL(20, 8), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class SymbolHolder(Base):
+    __tablename__ = "symbol_holders"
+    __table_args__ = (
+        Index("ix_symbol_holders_portfolio_id", "portfolio_id"),
+    )
+    
+    # Reverse index: which portfolios (and users) hold a (symbol, asset_type)
+    symbol = Column(String, primary_key=True)
+    asset_type = Column(String, primary_key=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+
+class ValuationDirtyUser(Base):
+    __tablename__ = "valuation_dirty_users"
+    
+    # Users whose holdings or prices changed since their last valuation
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    marked_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        Index("ix_export_jobs_user_id_created_at", "user_id", "created_at"),
+    )
+    
+    # A background export and, once completed, the artifact it produced
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    format = Column(String, nullable=False)
+    extension = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # 'pending', 'running', 'completed', 'failed'
+    path = Column(String, nullable=True)
+    cached = Column(Boolean, nullable=False, default=False)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+
 class News(Base):
     __tablename__ = "news"
     
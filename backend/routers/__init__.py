@@ -1,3 +1,3 @@
-from . import auth, portfolios, networth, export, news
+from . import auth, portfolios, networth, export, news, prices
 
-__all__ = ["auth", "portfolios", "networth", "export", "news"]
+__all__ = ["auth", "portfolios", "networth", "export", "news", "prices"]
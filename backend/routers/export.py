@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-from models import User
-from schemas import ExportResponse
-from services.portfolio_service import portfolio_service
-from utils.auth import get_current_user
-from utils.encryption import encryption
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, NamedTuple, Optional
+from decimal import Decimal
+from database import get_db, get_async_db
+from models import User, ExportJob
+from schemas import ExportJobCreate, ExportJobResponse
+from services.valuation_service import valuation_service, HoldingRow
+from services.export_service import export_service
+from utils.auth import get_current_user, get_current_user_async
 import csv
 import json
 import io
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,183 +25,562 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/export", tags=["export"])
 
 
+CSV_HEADER = [
+    'Portfolio Name',
+    'Asset Symbol',
+    'Asset Name',
+    'Asset Type',
+    'Quantity',
+    'Purchase Price',
+    'Purchase Date',
+    'Current Price',
+    'Current Value',
+    'Gain/Loss',
+    'Gain/Loss %'
+]
+
+# Flush encoded output once the buffer holds roughly this many characters
+CSV_CHUNK_SIZE = 64 * 1024
+
+
+def csv_row(holding: HoldingRow) -> list:
+    """Format one holding as a CSV export row"""
+    purchase_price = float(holding.purchase_price)
+    current_price = float(holding.current_price) if holding.current_price else 0
+    current_value = float(holding.current_value) if holding.current_value else 0
+    purchase_value = purchase_price * float(holding.quantity)
+    
+    gain_loss = current_value - purchase_value
+    gain_loss_percent = (gain_loss / purchase_value * 100) if purchase_value > 0 else 0
+    
+    return [
+        holding.portfolio_name,
+        holding.symbol,
+        holding.name,
+        holding.asset_type,
+        float(holding.quantity),
+        purchase_price,
+        holding.purchase_date.strftime('%Y-%m-%d'),
+        current_price if current_price > 0 else 'N/A',
+        current_value if current_value > 0 else 'N/A',
+        f"{gain_loss:.2f}" if current_value > 0 else 'N/A',
+        f"{gain_loss_percent:.2f}%" if current_value > 0 else 'N/A'
+    ]
+
+
+class CsvChunker:
+    """Formats holdings into CSV and hands back encoded chunks of about CSV_CHUNK_SIZE"""
+    
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(CSV_HEADER)
+    
+    def add(self, holding: HoldingRow) -> Optional[bytes]:
+        """Write one holding, returning a chunk once the buffer is full"""
+        if holding.asset_id is not None:
+            self.writer.writerow(csv_row(holding))
+        if self.buffer.tell() < CSV_CHUNK_SIZE:
+            return None
+        return self.flush()
+    
+    def flush(self) -> bytes:
+        chunk = self.buffer.getvalue().encode('utf-8')
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+
+def iter_csv(holdings: Iterable[HoldingRow]) -> Iterator[bytes]:
+    """Yield encoded CSV chunks as holdings are read"""
+    chunker = CsvChunker()
+    for holding in holdings:
+        chunk = chunker.add(holding)
+        if chunk:
+            yield chunk
+    yield chunker.flush()
+
+
+async def aiter_csv(holdings: AsyncIterable[HoldingRow]) -> AsyncIterator[bytes]:
+    """Async variant of iter_csv over a streamed result"""
+    chunker = CsvChunker()
+    async for holding in holdings:
+        chunk = chunker.add(holding)
+        if chunk:
+            yield chunk
+    yield chunker.flush()
+
+
+@contextmanager
+def export_errors_logged(label: str, user_id: int):
+    """Log an export that fails after its response has started, then abort the transfer"""
+    try:
+        yield
+    except Exception as e:
+        logger.error(f"Error exporting {label} for user {user_id}: {e}")
+        raise
+
+
+def logged_stream(chunks: Iterable[bytes], label: str, user_id: int) -> Iterator[bytes]:
+    with export_errors_logged(label, user_id):
+        yield from chunks
+
+
+async def alogged_stream(chunks: AsyncIterable[bytes], label: str, user_id: int) -> AsyncIterator[bytes]:
+    with export_errors_logged(label, user_id):
+        async for chunk in chunks:
+            yield chunk
+
+
 @router.get("/csv")
 async def export_csv(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Export user's portfolio data as CSV"""
-    try:
-        # Get user's portfolios with valuations
-        portfolios = await portfolio_service.get_user_portfolios_with_valuations(db, current_user.id)
-        
-        # Create CSV data
-        output = io.StringIO()
-        writer = csv.writer(output)
+    # Rows are produced from a server-side cursor while the response streams
+    holdings = valuation_service.stream_user_holdings(db, current_user.id)
+    
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"wealthwise_portfolio_{timestamp}.csv"
+    
+    return StreamingResponse(
+        alogged_stream(aiter_csv(holdings), "CSV", current_user.id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def asset_export_data(holding: HoldingRow) -> dict:
+    """Build the exported representation of one asset"""
+    purchase_price = float(holding.purchase_price)
+    current_price = float(holding.current_price) if holding.current_price else None
+    current_value = float(holding.current_value) if holding.current_value else None
+    purchase_value = purchase_price * float(holding.quantity)
+    
+    asset_data = {
+        "id": holding.asset_id,
+        "symbol": holding.symbol,
+        "name": holding.name,
+        "asset_type": holding.asset_type,
+        "quantity": float(holding.quantity),
+        "purchase_price": purchase_price,
+        "purchase_date": holding.purchase_date.isoformat(),
+        "purchase_value": purchase_value,
+        "current_price": current_price,
+        "current_value": current_value,
+        "metadata": holding.metadata
+    }
+    
+    if current_value and purchase_value > 0:
+        asset_data["gain_loss"] = current_value - purchase_value
+        asset_data["gain_loss_percent"] = (current_value - purchase_value) / purchase_value * 100
+    
+    return asset_data
+
+
+def value_summary(purchase_value: float, current_value: float) -> dict:
+    """Gain/loss figures shared by portfolio and overall summaries"""
+    return {
+        "gain_loss": current_value - purchase_value if current_value else None,
+        "gain_loss_percent": ((current_value - purchase_value) / purchase_value * 100) if purchase_value > 0 and current_value else None
+    }
+
+
+def chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    """Group small text pieces into encoded chunks of about CSV_CHUNK_SIZE"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CSV_CHUNK_SIZE:
+            yield "".join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode('utf-8')
+
+
+def iter_json(user: User, holdings: Iterable[HoldingRow], include_timestamp: bool = True) -> Iterator[str]:
+    """Yield the JSON export piece by piece; each portfolio's summary follows its assets"""
+    def dumps(value):
+        return json.dumps(value, default=str)
+    
+    yield '{"user": ' + dumps({"id": user.id, "email": user.email, "full_name": user.full_name})
+    if include_timestamp:
+        yield ', "export_timestamp": ' + dumps(datetime.now().isoformat())
+    yield ', "portfolios": ['
+    
+    portfolio_count = 0
+    total_purchase_value = 0
+    total_current_value = 0
+    current_portfolio_id = None
+    
+    def close_portfolio():
+        summary = {
+            "total_assets": asset_count,
+            "purchase_value": portfolio_purchase_value,
+            "current_value": portfolio_current_value,
+            **value_summary(portfolio_purchase_value, portfolio_current_value)
+        }
+        return '], "summary": ' + dumps(summary) + '}'
+    
+    for holding in holdings:
+        if holding.portfolio_id != current_portfolio_id:
+            if current_portfolio_id is not None:
+                yield close_portfolio()
+                total_purchase_value += portfolio_purchase_value
+                total_current_value += portfolio_current_value
+            
+            current_portfolio_id = holding.portfolio_id
+            asset_count = 0
+            portfolio_purchase_value = 0
+            portfolio_current_value = 0
+            
+            portfolio_header = dumps({
+                "id": holding.portfolio_id,
+                "name": holding.portfolio_name,
+                "description": holding.portfolio_description,
+                "created_at": holding.portfolio_created_at.isoformat()
+            })
+            yield (", " if portfolio_count else "") + portfolio_header[:-1] + ', "assets": ['
+            portfolio_count += 1
         
-        # Write header
-        writer.writerow([
-            'Portfolio Name',
-            'Asset Symbol',
-            'Asset Name',
-            'Asset Type',
-            'Quantity',
-            'Purchase Price',
-            'Purchase Date',
-            'Current Price',
-            'Current Value',
-            'Gain/Loss',
-            'Gain/Loss %'
-        ])
+        if holding.asset_id is None:
+            continue
         
-        # Write data rows
-        for portfolio in portfolios:
-            for asset in portfolio.assets:
-                purchase_price = float(asset.purchase_price) if hasattr(asset, 'purchase_price') else 0
-                current_price = float(asset.current_price) if hasattr(asset, 'current_price') and asset.current_price else 0
-                current_value = float(asset.current_value) if hasattr(asset, 'current_value') and asset.current_value else 0
-                purchase_value = purchase_price * float(asset.quantity)
-                
-                gain_loss = current_value - purchase_value
-                gain_loss_percent = (gain_loss / purchase_value * 100) if purchase_value > 0 else 0
-                
-                writer.writerow([
-                    portfolio.name,
-                    asset.symbol,
-                    asset.name,
-                    asset.asset_type,
-                    float(asset.quantity),
-                    purchase_price,
-                    asset.purchase_date.strftime('%Y-%m-%d'),
-                    current_price if current_price > 0 else 'N/A',
-                    current_value if current_value > 0 else 'N/A',
-                    f"{gain_loss:.2f}" if current_value > 0 else 'N/A',
-                    f"{gain_loss_percent:.2f}%" if current_value > 0 else 'N/A'
-                ])
+        asset_data = asset_export_data(holding)
+        portfolio_purchase_value += asset_data["purchase_value"]
+        if asset_data["current_value"]:
+            portfolio_current_value += asset_data["current_value"]
         
-        output.seek(0)
+        yield (", " if asset_count else "") + dumps(asset_data)
+        asset_count += 1
+    
+    if current_portfolio_id is not None:
+        yield close_portfolio()
+        total_purchase_value += portfolio_purchase_value
+        total_current_value += portfolio_current_value
+    
+    summary = {
+        "total_portfolios": portfolio_count,
+        "total_purchase_value": total_purchase_value,
+        "total_current_value": total_current_value
+    }
+    totals = value_summary(total_purchase_value, total_current_value)
+    summary["total_gain_loss"] = totals["gain_loss"]
+    summary["total_gain_loss_percent"] = totals["gain_loss_percent"]
+    yield '], "summary": ' + dumps(summary) + '}'
+
+
+def iter_ndjson(holdings: Iterable[HoldingRow]) -> Iterator[str]:
+    """Yield one JSON object per asset, one per line"""
+    for holding in holdings:
+        if holding.asset_id is None:
+            continue
+        asset_data = asset_export_data(holding)
+        asset_data["portfolio_id"] = holding.portfolio_id
+        asset_data["portfolio_name"] = holding.portfolio_name
+        yield json.dumps(asset_data, default=str) + "\n"
+
+
+@router.get("/json")
+def export_json(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Export user's portfolio data as JSON"""
+    holdings = valuation_service.iter_user_holdings(db, current_user.id)
+    
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"wealthwise_portfolio_{timestamp}.json"
+    
+    return StreamingResponse(
+        logged_stream(chunked(iter_json(current_user, holdings)), "JSON", current_user.id),
+        media_type="application/json",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@router.get("/ndjson")
+def export_ndjson(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Export user's assets as newline-delimited JSON, one asset per line"""
+    holdings = valuation_service.iter_user_holdings(db, current_user.id)
+    
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"wealthwise_portfolio_{timestamp}.ndjson"
+    
+    return StreamingResponse(
+        logged_stream(chunked(iter_ndjson(holdings)), "NDJSON", current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+# Columnar exports carry the CSV columns with typed decimal and timestamp fields
+PRICE_TYPE = pa.decimal128(20, 8)
+VALUE_TYPE = pa.decimal128(38, 8)
+ARROW_SCHEMA = pa.schema([
+    ("portfolio_name", pa.string()),
+    ("symbol", pa.string()),
+    ("name", pa.string()),
+    ("asset_type", pa.string()),
+    ("quantity", PRICE_TYPE),
+    ("purchase_price", PRICE_TYPE),
+    ("purchase_date", pa.timestamp("us")),
+    ("current_price", PRICE_TYPE),
+    ("current_value", VALUE_TYPE),
+    ("gain_loss", VALUE_TYPE),
+    ("gain_loss_percent", pa.float64()),
+])
+
+# Rows per Parquet row group / Arrow record batch
+COLUMNAR_BATCH_SIZE = 10000
+
+EIGHT_PLACES = Decimal("0.00000001")
+
+
+def _quantize(value: Optional[Decimal]) -> Optional[Decimal]:
+    return value.quantize(EIGHT_PLACES) if value is not None else None
+
+
+def iter_record_batches(holdings: Iterable[HoldingRow], batch_size: int = None) -> Iterator[pa.RecordBatch]:
+    """Yield typed record batches of the CSV export columns"""
+    batch_size = batch_size or COLUMNAR_BATCH_SIZE
+    columns = {field.name: [] for field in ARROW_SCHEMA}
+    count = 0
+    
+    for holding in holdings:
+        if holding.asset_id is None:
+            continue
         
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"wealthwise_portfolio_{timestamp}.csv"
+        purchase_price = holding.purchase_price
+        purchase_value = purchase_price * holding.quantity
+        current_value = holding.current_value
+        gain_loss = current_value - purchase_value if current_value is not None else None
         
-        return StreamingResponse(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        columns["portfolio_name"].append(holding.portfolio_name)
+        columns["symbol"].append(holding.symbol)
+        columns["name"].append(holding.name)
+        columns["asset_type"].append(holding.asset_type)
+        columns["quantity"].append(_quantize(holding.quantity))
+        columns["purchase_price"].append(_quantize(purchase_price))
+        columns["purchase_date"].append(holding.purchase_date)
+        columns["current_price"].append(_quantize(holding.current_price))
+        columns["current_value"].append(_quantize(current_value))
+        columns["gain_loss"].append(_quantize(gain_loss))
+        columns["gain_loss_percent"].append(
+            float(gain_loss / purchase_value * 100) if gain_loss is not None and purchase_value > 0 else None
         )
+        count += 1
         
-    except Exception as e:
-        logger.error(f"Error exporting CSV for user {current_user.id}: {e}")
+        if count >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=ARROW_SCHEMA)
+            columns = {name: [] for name in columns}
+            count = 0
+    
+    if count:
+        yield pa.RecordBatch.from_pydict(columns, schema=ARROW_SCHEMA)
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file object whose written bytes are drained as response chunks"""
+    
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(holdings: Iterable[HoldingRow]) -> Iterator[bytes]:
+    """Yield a Parquet file one row group at a time"""
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), ARROW_SCHEMA, compression="zstd")
+    for batch in iter_record_batches(holdings):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def iter_arrow(holdings: Iterable[HoldingRow]) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream one record batch at a time"""
+    sink = ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), ARROW_SCHEMA)
+    for batch in iter_record_batches(holdings):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+@router.get("/parquet")
+def export_parquet(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Export user's assets as a Parquet file"""
+    holdings = valuation_service.iter_user_holdings(db, current_user.id)
+    
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"wealthwise_portfolio_{timestamp}.parquet"
+    
+    return StreamingResponse(
+        logged_stream(iter_parquet(holdings), "Parquet", current_user.id),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@router.get("/arrow")
+def export_arrow(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Export user's assets as an Arrow IPC stream"""
+    holdings = valuation_service.iter_user_holdings(db, current_user.id)
+    
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"wealthwise_portfolio_{timestamp}.arrows"
+    
+    return StreamingResponse(
+        logged_stream(iter_arrow(holdings), "Arrow", current_user.id),
+        media_type="application/vnd.apache.arrow.stream",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+class ExportFormat(NamedTuple):
+    media_type: str
+    extension: str
+    render: Callable[[Session, User], Iterable[bytes]]
+
+
+EXPORT_FORMATS = {
+    "csv": ExportFormat(
+        "text/csv", "csv",
+        lambda db, user: iter_csv(valuation_service.iter_user_holdings(db, user.id))
+    ),
+    "json": ExportFormat(
+        "application/json", "json",
+        # Cached artifacts outlive the request, so they carry no export timestamp
+        lambda db, user: chunked(iter_json(user, valuation_service.iter_user_holdings(db, user.id), include_timestamp=False))
+    ),
+    "ndjson": ExportFormat(
+        "application/x-ndjson", "ndjson",
+        lambda db, user: chunked(iter_ndjson(valuation_service.iter_user_holdings(db, user.id)))
+    ),
+    "parquet": ExportFormat(
+        "application/vnd.apache.parquet", "parquet",
+        lambda db, user: iter_parquet(valuation_service.iter_user_holdings(db, user.id))
+    ),
+    "arrow": ExportFormat(
+        "application/vnd.apache.arrow.stream", "arrows",
+        lambda db, user: iter_arrow(valuation_service.iter_user_holdings(db, user.id))
+    ),
+}
+
+
+def export_job_response(job: ExportJob) -> ExportJobResponse:
+    return ExportJobResponse(
+        id=job.id,
+        format=job.format,
+        status=job.status,
+        created_at=job.created_at,
+        completed_at=job.completed_at,
+        cached=job.cached,
+        error=job.error,
+        download_url=f"/export/jobs/{job.id}/download" if job.status == "completed" else None
+    )
+
+
+@router.post("/jobs", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_export_job(
+    job_request: ExportJobCreate,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Start a background export; current artifacts are reused without recomputing"""
+    export_format = EXPORT_FORMATS.get(job_request.format)
+    if export_format is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error exporting data"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format. Choose one of: {', '.join(EXPORT_FORMATS)}"
         )
+    
+    job = export_service.create_job(db, current_user.id, job_request.format, export_format.extension)
+    if job.status == "pending":
+        background_tasks.add_task(export_service.run_job, job.id, export_format.render)
+    
+    return export_job_response(job)
 
 
-@router.get("/json")
-async def export_json(
+@router.get("/jobs/{job_id}", response_model=ExportJobResponse)
+def get_export_job(
+    job_id: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Export user's portfolio data as JSON"""
-    try:
-        # Get user's portfolios with valuations
-        portfolios = await portfolio_service.get_user_portfolios_with_valuations(db, current_user.id)
-        
-        # Build JSON structure
-        export_data = {
-            "user": {
-                "id": current_user.id,
-                "email": current_user.email,
-                "full_name": current_user.full_name
-            },
-            "export_timestamp": datetime.now().isoformat(),
-            "portfolios": []
-        }
-        
-        total_current_value = 0
-        total_purchase_value = 0
-        
-        for portfolio in portfolios:
-            portfolio_data = {
-                "id": portfolio.id,
-                "name": portfolio.name,
-                "description": portfolio.description,
-                "created_at": portfolio.created_at.isoformat(),
-                "assets": []
-            }
-            
-            portfolio_current_value = 0
-            portfolio_purchase_value = 0
-            
-            for asset in portfolio.assets:
-                purchase_price = float(asset.purchase_price) if hasattr(asset, 'purchase_price') else 0
-                current_price = float(asset.current_price) if hasattr(asset, 'current_price') and asset.current_price else None
-                current_value = float(asset.current_value) if hasattr(asset, 'current_value') and asset.current_value else None
-                purchase_value = purchase_price * float(asset.quantity)
-                
-                if current_value:
-                    portfolio_current_value += current_value
-                portfolio_purchase_value += purchase_value
-                
-                asset_data = {
-                    "id": asset.id,
-                    "symbol": asset.symbol,
-                    "name": asset.name,
-                    "asset_type": asset.asset_type,
-                    "quantity": float(asset.quantity),
-                    "purchase_price": purchase_price,
-                    "purchase_date": asset.purchase_date.isoformat(),
-                    "purchase_value": purchase_value,
-                    "current_price": current_price,
-                    "current_value": current_value,
-                    "metadata": asset.metadata
-                }
-                
-                if current_value and purchase_value > 0:
-                    asset_data["gain_loss"] = current_value - purchase_value
-                    asset_data["gain_loss_percent"] = (current_value - purchase_value) / purchase_value * 100
-                
-                portfolio_data["assets"].append(asset_data)
-            
-            portfolio_data["summary"] = {
-                "total_assets": len(portfolio.assets),
-                "purchase_value": portfolio_purchase_value,
-                "current_value": portfolio_current_value,
-                "gain_loss": portfolio_current_value - portfolio_purchase_value if portfolio_current_value else None,
-                "gain_loss_percent": ((portfolio_current_value - portfolio_purchase_value) / portfolio_purchase_value * 100) if portfolio_purchase_value > 0 and portfolio_current_value else None
-            }
-            
-            total_current_value += portfolio_current_value
-            total_purchase_value += portfolio_purchase_value
-            
-            export_data["portfolios"].append(portfolio_data)
-        
-        # Add overall summary
-        export_data["summary"] = {
-            "total_portfolios": len(portfolios),
-            "total_purchase_value": total_purchase_value,
-            "total_current_value": total_current_value,
-            "total_gain_loss": total_current_value - total_purchase_value if total_current_value else None,
-            "total_gain_loss_percent": ((total_current_value - total_purchase_value) / total_purchase_value * 100) if total_purchase_value > 0 and total_current_value else None
-        }
-        
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"wealthwise_portfolio_{timestamp}.json"
-        
-        json_str = json.dumps(export_data, indent=2, default=str)
-        
-        return StreamingResponse(
-            io.BytesIO(json_str.encode('utf-8')),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+    """Poll the status of an export job"""
+    job = export_service.get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
         )
-        
-    except Exception as e:
-        logger.error(f"Error exporting JSON for user {current_user.id}: {e}")
+    
+    return export_job_response(job)
+
+
+@router.get("/jobs/{job_id}/download")
+def download_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download the artifact of a completed export job"""
+    job = export_service.get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    
+    if job.status != "completed" or not Path(job.path).exists():
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error exporting data"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Export is not ready"
         )
+    
+    timestamp = job.completed_at.strftime('%Y%m%d_%H%M%S')
+    return FileResponse(
+        job.path,
+        media_type=EXPORT_FORMATS[job.format].media_type,
+        filename=f"wealthwise_portfolio_{timestamp}.{job.extension}"
+    )
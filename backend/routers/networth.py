@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List
-from database import get_db
-from models import User, NetWorthSnapshot
-from schemas import NetWorthCurrent, NetWorthHistoryResponse, NetWorthHistory
-from services.portfolio_service import portfolio_service
-from services.price_service import price_service
-from utils.auth import get_current_user
-from utils.encryption import encryption
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from database import get_db, get_async_db
+from models import User, NetWorthSnapshot
+from schemas import NetWorthCurrent, NetWorthHistoryResponse, NetWorthHistory, NetWorthSummary, PortfolioValueSummary
+from services.valuation_service import valuation_service, HISTORY_INTERVALS
+from utils.auth import get_current_user, get_current_user_async
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,58 +19,25 @@ router = APIRouter(prefix="/networth", tags=["net worth"])
 
 @router.get("/current", response_model=NetWorthCurrent)
 async def get_current_networth(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get current net worth for the user"""
     try:
-        # Get user's portfolios with current valuations
-        portfolios = await portfolio_service.get_user_portfolios_with_valuations(db, current_user.id)
-        
-        total_value = Decimal('0')
-        portfolio_breakdown = {}
-        
-        for portfolio in portfolios:
-            portfolio_value = Decimal('0')
-            asset_breakdown = []
-            
-            for asset in portfolio.assets:
-                current_value = Decimal('0')
-                current_price = None
-                
-                if hasattr(asset, 'current_price') and asset.current_price:
-                    current_price = asset.current_price
-                    current_value = asset.quantity * current_price
-                    portfolio_value += current_value
-                
-                asset_breakdown.append({
-                    'symbol': asset.symbol,
-                    'name': asset.name,
-                    'asset_type': asset.asset_type,
-                    'quantity': float(asset.quantity),
-                    'purchase_price': float(asset.purchase_price) if hasattr(asset, 'purchase_price') else 0,
-                    'current_price': float(current_price) if current_price else None,
-                    'current_value': float(current_value),
-                    'purchase_date': asset.purchase_date.isoformat()
-                })
-            
-            total_value += portfolio_value
-            portfolio_breakdown[portfolio.name] = {
-                'id': portfolio.id,
-                'value': float(portfolio_value),
-                'assets': asset_breakdown
-            }
+        # Same valuation pass the nightly snapshots use, run over the async connection
+        valuation = await db.run_sync(valuation_service.value_user, current_user.id)
         
         # Get the latest snapshot timestamp
-        latest_snapshot = db.query(NetWorthSnapshot).filter(
-            NetWorthSnapshot.user_id == current_user.id
-        ).order_by(desc(NetWorthSnapshot.timestamp)).first()
-        
-        last_updated = latest_snapshot.timestamp if latest_snapshot else None
+        last_updated = await db.scalar(
+            select(NetWorthSnapshot.timestamp)
+            .where(NetWorthSnapshot.user_id == current_user.id)
+            .order_by(desc(NetWorthSnapshot.timestamp))
+            .limit(1)
+        )
         
         return NetWorthCurrent(
-            total_value=total_value,
-            portfolio_breakdown=portfolio_breakdown,
+            total_value=valuation.total_value,
+            portfolio_breakdown=valuation.current_breakdown(),
             last_updated=last_updated
         )
         
@@ -82,26 +49,82 @@ async def get_current_networth(
         )
 
 
+def gain_loss_percent(gain_loss, cost_basis) -> Optional[float]:
+    return float(gain_loss / cost_basis * 100) if cost_basis > 0 else None
+
+
+@router.get("/summary", response_model=NetWorthSummary)
+def get_networth_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get per-portfolio and total value, cost basis and gain/loss from stored valuations"""
+    portfolios = [
+        PortfolioValueSummary(
+            portfolio_id=row.portfolio_id,
+            name=row.name,
+            asset_count=row.asset_count,
+            cost_basis=row.cost_basis,
+            current_value=row.current_value,
+            gain_loss=row.gain_loss,
+            gain_loss_percent=gain_loss_percent(row.gain_loss, row.cost_basis),
+            updated_at=row.updated_at
+        )
+        for row in valuation_service.get_portfolio_values(db, current_user.id)
+    ]
+    
+    total_value = sum((portfolio.current_value for portfolio in portfolios), Decimal('0'))
+    cost_basis = sum((portfolio.cost_basis for portfolio in portfolios), Decimal('0'))
+    return NetWorthSummary(
+        total_value=total_value,
+        cost_basis=cost_basis,
+        gain_loss=total_value - cost_basis,
+        gain_loss_percent=gain_loss_percent(total_value - cost_basis, cost_basis),
+        portfolios=portfolios
+    )
+
+
 @router.get("/history", response_model=NetWorthHistoryResponse)
 def get_networth_history(
     days: int = 30,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: Optional[str] = None,
+    include_breakdown: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get net worth history for the user"""
+    """Get net worth history for the user.
+    
+    Covers start..end (default: the last `days` days), optionally downsampled to the
+    last snapshot per interval (1h, 1d, 1w, 1M). Breakdowns are reassembled only
+    when include_breakdown is set.
+    """
+    if interval is not None and interval not in HISTORY_INTERVALS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported interval. Choose one of: {', '.join(HISTORY_INTERVALS)}"
+        )
+    
+    # Naive bounds are taken as UTC
+    end = end or datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    start = start or end - timedelta(days=days)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    
     try:
-        # Get historical snapshots
-        snapshots = db.query(NetWorthSnapshot).filter(
-            NetWorthSnapshot.user_id == current_user.id
-        ).order_by(desc(NetWorthSnapshot.timestamp)).limit(days).all()
+        snapshots = valuation_service.snapshot_history(
+            db, current_user.id, start, end, interval, include_breakdown
+        )
         
-        history = []
-        for snapshot in reversed(snapshots):  # Reverse to get chronological order
-            history.append(NetWorthHistory(
-                timestamp=snapshot.timestamp,
-                total_value=snapshot.total_value,
-                portfolio_breakdown=snapshot.portfolio_breakdown
-            ))
+        history = [NetWorthHistory(**snapshot) for snapshot in snapshots]
         
         return NetWorthHistoryResponse(history=history)
         
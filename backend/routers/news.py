@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from database import get_db
-from models import News
+from database import get_async_db
+from services.news_service import news_service
 from schemas import NewsItem
-from utils.auth import get_current_user
+from utils.auth import get_current_user_async
 from schemas import User
 
 router = APIRouter(prefix="/api/news", tags=["news"])
@@ -25,8 +25,8 @@ def classify_importance(importance_score: float) -> str:
 @router.get("", response_model=List[NewsItem])
 async def get_news(
     symbols: str = Query(..., description="Comma-separated list of symbols"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get news articles for specified symbols.
@@ -39,13 +39,7 @@ async def get_news(
         raise HTTPException(status_code=400, detail="At least one symbol must be provided")
     
     # Query news articles for the specified symbols
-    news_query = db.query(News).filter(
-        News.symbol.in_(symbol_list)
-    ).order_by(
-        News.timestamp.desc()
-    ).limit(20)
-    
-    news_articles = news_query.all()
+    news_articles = await news_service.get_recent_news(db, symbol_list, limit=20)
     
     # Convert to response format with importance classification
     news_items = []
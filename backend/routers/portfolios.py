@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from database import get_db
+from database import get_db, get_async_db
 from models import User
 from schemas import Portfolio, PortfolioCreate, PortfolioWithAssets, Asset, AssetCreate
 from services.portfolio_service import portfolio_service
-from utils.auth import get_current_user
+from utils.auth import get_current_user, get_current_user_async
 
 router = APIRouter(prefix="/portfolios", tags=["portfolios"])
 
@@ -22,8 +23,8 @@ def create_portfolio(
 
 @router.get("/", response_model=List[PortfolioWithAssets])
 async def get_portfolios(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all portfolios for the current user with asset valuations"""
     return await portfolio_service.get_user_portfolios_with_valuations(db, current_user.id)
@@ -36,15 +37,12 @@ def get_portfolio(
     db: Session = Depends(get_db)
 ):
     """Get a specific portfolio"""
-    portfolio = portfolio_service.get_portfolio_by_id(db, portfolio_id, current_user.id)
+    portfolio = portfolio_service.get_portfolio_with_valuations(db, portfolio_id, current_user.id)
     if not portfolio:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Portfolio not found"
         )
-    
-    # Load assets
-    portfolio.assets = portfolio_service.get_portfolio_assets(db, portfolio_id, current_user.id)
     return portfolio
 
 
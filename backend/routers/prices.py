@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from database import get_db
+from models import User
+from schemas import PriceHistoryResponse, PriceHistoryPoint
+from services.price_service import price_service, ROLLUP_INTERVALS
+from utils.auth import get_current_user
+
+router = APIRouter(prefix="/prices", tags=["prices"])
+
+
+@router.get("/{symbol}/history", response_model=PriceHistoryResponse)
+def get_price_history(
+    symbol: str,
+    asset_type: str = "stock",
+    interval: str = "1d",
+    days: int = 30,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get OHLC price history for a symbol from the hourly or daily rollups.
+    
+    Covers start..end (default: the last `days` days).
+    """
+    if interval not in ROLLUP_INTERVALS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported interval. Choose one of: {', '.join(ROLLUP_INTERVALS)}"
+        )
+    
+    # Naive bounds are taken as UTC
+    end = end or datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    start = start or end - timedelta(days=days)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    
+    symbol = symbol.upper()
+    rollups = price_service.get_price_history(db, symbol, asset_type, interval, start, end)
+    
+    return PriceHistoryResponse(
+        symbol=symbol,
+        asset_type=asset_type,
+        interval=interval,
+        history=[PriceHistoryPoint.model_validate(rollup) for rollup in rollups]
+    )
@@ -1,14 +1,18 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.orm import Session
-from sqlalchemy import distinct
 from database import SessionLocal
-from models import Asset, NetWorthSnapshot, User
 from services.price_service import price_service
-from utils.encryption import encryption
-from decimal import Decimal
+from services.holder_index_service import holder_index_service
+from services.retention_service import retention_service
+from services.valuation_service import valuation_service, init_valuation_worker, value_user_shard
+from config import settings
+from concurrent.futures import ProcessPoolExecutor
 import logging
 import asyncio
+import multiprocessing
+import time
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +32,24 @@ class SchedulerService:
             name='Daily Price Update and Valuation',
             replace_existing=True
         )
+        
+        # Background migration of legacy purchase price ciphertexts at 03:30
+        self.scheduler.add_job(
+            func=self.reencrypt_purchase_prices_job,
+            trigger=CronTrigger(hour=3, minute=30),
+            id='reencrypt_purchase_prices',
+            name='Re-encrypt Legacy Purchase Prices',
+            replace_existing=True
+        )
+        
+        # Snapshot retention and partition upkeep at 04:00
+        self.scheduler.add_job(
+            func=self.snapshot_retention_job,
+            trigger=CronTrigger(hour=4, minute=0),
+            id='snapshot_retention',
+            name='Snapshot Retention and Partition Maintenance',
+            replace_existing=True
+        )
     
     async def daily_price_update_job(self):
         """Daily job to fetch prices and compute valuations"""
@@ -35,18 +57,33 @@ class SchedulerService:
         
         db = SessionLocal()
         try:
-            # Get all unique symbols and asset types from assets
-            unique_assets = db.query(
-                distinct(Asset.symbol),
-                Asset.asset_type
-            ).all()
+            # Price and net worth snapshots land in this month's partition
+            await asyncio.to_thread(retention_service.ensure_current_partitions, db)
+            
+            # Every held (symbol, asset_type), from the holder index rather than an assets scan
+            unique_assets = holder_index_service.get_held_keys(db)
+            
+            crypto_symbols = [symbol for symbol, asset_type in unique_assets if asset_type.lower() == 'crypto']
+            other_assets = [(symbol, asset_type) for symbol, asset_type in unique_assets if asset_type.lower() != 'crypto']
             
-            # Fetch prices for all unique assets
+            # Fetch prices concurrently; crypto goes out in a few multi-id requests
+            # and each provider bounds its own in-flight requests
+            logger.info(f"Fetching prices for {len(unique_assets)} assets ({len(crypto_symbols)} crypto)")
+            crypto_prices, *other_prices = await asyncio.gather(
+                price_service.fetch_crypto_prices(crypto_symbols),
+                *(price_service.fetch_price(symbol, asset_type) for symbol, asset_type in other_assets)
+            )
+            
+            fetched = []
             for symbol, asset_type in unique_assets:
-                logger.info(f"Fetching price for {symbol} ({asset_type})")
-                await price_service.fetch_and_store_price(db, symbol, asset_type)
-                # Add small delay to avoid rate limiting
-                await asyncio.sleep(1)
+                if asset_type.lower() == 'crypto' and symbol.upper() in crypto_prices:
+                    fetched.append({**crypto_prices[symbol.upper()], 'asset_type': asset_type})
+            for (symbol, asset_type), price_data in zip(other_assets, other_prices):
+                if price_data:
+                    fetched.append({**price_data, 'asset_type': asset_type})
+            
+            # Store off the event loop so API requests keep being served
+            await asyncio.to_thread(self.store_fetched_prices, db, fetched)
             
             # Compute and store net worth snapshots for all users
             await self.compute_all_user_valuations(db)
@@ -58,63 +95,107 @@ class SchedulerService:
         finally:
             db.close()
     
+    def store_fetched_prices(self, db: Session, fetched: list):
+        """Store all fetched prices in one bulk insert and report the ingest rate"""
+        started = time.perf_counter()
+        try:
+            stored = price_service.store_prices_bulk(db, fetched)
+        except Exception as e:
+            logger.error(f"Error storing {len(fetched)} prices: {e}")
+            return
+        
+        elapsed = time.perf_counter() - started
+        rate = stored / elapsed if elapsed > 0 else float(stored)
+        logger.info(f"Stored {stored} price snapshots in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    
     async def compute_all_user_valuations(self, db: Session):
         """Compute net worth for all users"""
-        users = db.query(User).all()
+        if settings.valuation_workers <= 1:
+            # Set-based valuation in user batches, run off the event loop
+            await asyncio.to_thread(
+                valuation_service.compute_all_user_valuations, db, settings.valuation_batch_size
+            )
+            return
         
-        for user in users:
-            try:
-                await self.compute_user_net_worth(db, user.id)
-            except Exception as e:
-                logger.error(f"Error computing net worth for user {user.id}: {e}")
-    
-    async def compute_user_net_worth(self, db: Session, user_id: int):
-        """Compute and store net worth snapshot for a user"""
-        from services.portfolio_service import portfolio_service
+        started = time.perf_counter()
+        cutoff = datetime.now(timezone.utc)
+        carried = await asyncio.to_thread(valuation_service.carry_forward_snapshots, db, cutoff)
         
-        # Get user's portfolios with current valuations
-        portfolios = await portfolio_service.get_user_portfolios_with_valuations(db, user_id)
+        shards = await asyncio.to_thread(valuation_service.user_id_shards, db, settings.valuation_shard_size)
+        logger.info(f"Valuing changed users in {len(shards)} shards across {settings.valuation_workers} processes")
         
-        total_value = Decimal('0')
-        portfolio_breakdown = {}
+        loop = asyncio.get_running_loop()
+        # Spawn rather than fork: workers must not inherit the scheduler's loop, threads or connections.
+        # Each worker opens one engine up front and values all of its shards through it.
+        with ProcessPoolExecutor(
+            max_workers=settings.valuation_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_valuation_worker
+        ) as pool:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(pool, value_user_shard, start_id, end_id, cutoff) for start_id, end_id in shards),
+                return_exceptions=True
+            )
         
-        for portfolio in portfolios:
-            portfolio_value = Decimal('0')
-            asset_breakdown = []
-            
-            for asset in portfolio.assets:
-                # Get latest price
-                latest_price = price_service.get_latest_price(db, asset.symbol, asset.asset_type)
-                
-                if latest_price:
-                    current_value = asset.quantity * latest_price.price
-                    portfolio_value += current_value
-                    
-                    asset_breakdown.append({
-                        'symbol': asset.symbol,
-                        'quantity': float(asset.quantity),
-                        'current_price': float(latest_price.price),
-                        'current_value': float(current_value),
-                        'purchase_price': float(encryption.decrypt(asset.purchase_price_encrypted))
-                    })
-            
-            total_value += portfolio_value
-            portfolio_breakdown[portfolio.name] = {
-                'value': float(portfolio_value),
-                'assets': asset_breakdown
-            }
+        stored = 0
+        failed = False
+        for (start_id, end_id), result in zip(shards, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error valuing user shard [{start_id}, {end_id}): {result}")
+                failed = True
+                continue
+            shard_stored, shard_seconds = result
+            stored += shard_stored
+            logger.info(f"Valued user shard [{start_id}, {end_id}): {shard_stored} snapshots in {shard_seconds:.2f}s")
         
-        # Store net worth snapshot
-        net_worth_snapshot = NetWorthSnapshot(
-            user_id=user_id,
-            total_value=total_value,
-            portfolio_breakdown=portfolio_breakdown
+        # Keep every flag after a failed shard so its users are revalued on the next run
+        if not failed:
+            await asyncio.to_thread(valuation_service.clear_dirty_users, db, cutoff)
+        logger.info(
+            f"Stored {stored} net worth snapshots and carried {carried} forward "
+            f"in {time.perf_counter() - started:.2f}s"
         )
+    
+    async def compute_user_net_worth(self, db: Session, user_id: int):
+        """Compute and store net worth snapshot for a user"""
+        # One valuation pass: prices and purchase prices are resolved once per asset
+        valuation = valuation_service.value_user(db, user_id)
+        valuation_service.write_snapshots(db, [valuation])
         
-        db.add(net_worth_snapshot)
-        db.commit()
+        logger.info(f"Stored net worth snapshot for user {user_id}: ${valuation.total_value}")
+    
+    async def reencrypt_purchase_prices_job(self):
+        """Rewrite legacy purchase price ciphertexts in batches until none remain"""
+        from services.portfolio_service import portfolio_service
         
-        logger.info(f"Stored net worth snapshot for user {user_id}: ${total_value}")
+        db = SessionLocal()
+        try:
+            total = 0
+            last_id = 0
+            while last_id is not None:
+                last_id, rewritten = await asyncio.to_thread(
+                    portfolio_service.reencrypt_legacy_purchase_prices, db, last_id, settings.reencrypt_batch_size
+                )
+                total += rewritten
+            
+            if total:
+                logger.info(f"Re-encrypted {total} legacy purchase prices")
+        except Exception as e:
+            logger.error(f"Error re-encrypting purchase prices: {e}")
+            db.rollback()
+        finally:
+            db.close()
+    
+    async def snapshot_retention_job(self):
+        """Create upcoming partitions, drop expired price data and thin old net worth snapshots"""
+        db = SessionLocal()
+        try:
+            await asyncio.to_thread(retention_service.apply_retention, db)
+        except Exception as e:
+            logger.error(f"Error applying snapshot retention: {e}")
+            db.rollback()
+        finally:
+            db.close()
     
     def start(self):
         """Start the scheduler"""
@@ -2,8 +2,8 @@ from .schemas import (
     UserBase, UserCreate, UserLogin, User, Token,
     PortfolioBase, PortfolioCreate, Portfolio, PortfolioWithAssets,
     AssetBase, AssetCreate, Asset,
-    NetWorthCurrent, NetWorthHistory, NetWorthHistoryResponse,
-    PriceSnapshot, ExportResponse,
+    NetWorthCurrent, NetWorthHistory, NetWorthHistoryResponse, NetWorthSummary, PortfolioValueSummary,
+    PriceSnapshot, PriceHistoryPoint, PriceHistoryResponse, ExportResponse, ExportJobCreate, ExportJobResponse,
     NewsItem, NewsResponse
 )
 
@@ -11,7 +11,7 @@ __all__ = [
     "UserBase", "UserCreate", "UserLogin", "User", "Token",
     "PortfolioBase", "PortfolioCreate", "Portfolio", "PortfolioWithAssets",
     "AssetBase", "AssetCreate", "Asset",
-    "NetWorthCurrent", "NetWorthHistory", "NetWorthHistoryResponse",
-    "PriceSnapshot", "ExportResponse",
+    "NetWorthCurrent", "NetWorthHistory", "NetWorthHistoryResponse", "NetWorthSummary", "PortfolioValueSummary",
+    "PriceSnapshot", "PriceHistoryPoint", "PriceHistoryResponse", "ExportResponse", "ExportJobCreate", "ExportJobResponse",
     "NewsItem", "NewsResponse"
 ]
@@ -95,13 +95,32 @@ class Asset(BaseModel):
 class NetWorthCurrent(BaseModel):
     total_value: Decimal
     portfolio_breakdown: Dict[str, Any]
-    last_updated: datetime
+    last_updated: Optional[datetime]
+
+
+class PortfolioValueSummary(BaseModel):
+    portfolio_id: int
+    name: str
+    asset_count: int
+    cost_basis: Decimal
+    current_value: Decimal
+    gain_loss: Decimal
+    gain_loss_percent: Optional[float] = None
+    updated_at: datetime
+
+
+class NetWorthSummary(BaseModel):
+    total_value: Decimal
+    cost_basis: Decimal
+    gain_loss: Decimal
+    gain_loss_percent: Optional[float] = None
+    portfolios: List[PortfolioValueSummary]
 
 
 class NetWorthHistory(BaseModel):
     timestamp: datetime
     total_value: Decimal
-    portfolio_breakdown: Dict[str, Any]
+    portfolio_breakdown: Optional[Dict[str, Any]] = None
 
 
 class NetWorthHistoryResponse(BaseModel):
@@ -121,12 +140,46 @@ class PriceSnapshot(BaseModel):
         from_attributes = True
 
 
+class PriceHistoryPoint(BaseModel):
+    bucket_start: datetime
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    sample_count: int
+    
+    class Config:
+        from_attributes = True
+
+
+class PriceHistoryResponse(BaseModel):
+    symbol: str
+    asset_type: str
+    interval: str
+    history: List[PriceHistoryPoint]
+
+
 # Export Schemas
 class ExportResponse(BaseModel):
     message: str
     download_url: Optional[str] = None
 
 
+class ExportJobCreate(BaseModel):
+    format: str = "csv"
+
+
+class ExportJobResponse(BaseModel):
+    id: str
+    format: str
+    status: str
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    cached: bool = False
+    error: Optional[str] = None
+    download_url: Optional[str] = None
+
+
 # News Schemas
 class NewsItem(BaseModel):
     id: int
@@ -1,4 +1,9 @@
 from .price_service import price_service
 from .portfolio_service import portfolio_service
+from .valuation_service import valuation_service
+from .export_service import export_service
+from .holder_index_service import holder_index_service
+from .retention_service import retention_service
+from .news_service import news_service
 
-__all__ = ["price_service", "portfolio_service"]
+__all__ = ["price_service", "portfolio_service", "valuation_service", "export_service", "holder_index_service", "retention_service", "news_service"]
@@ -0,0 +1,142 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, update
+from typing import Callable, Iterable, Optional
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from database import SessionLocal
+from models import Portfolio, Asset, LatestPrice, User, ExportJob
+from config import settings
+import hashlib
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Renders an export for a user from an open session, as encoded chunks
+ExportRenderer = Callable[[Session, User], Iterable[bytes]]
+
+
+class ExportService:
+    def __init__(self, export_dir: str, session_factory=SessionLocal):
+        self.export_dir = Path(export_dir)
+        self.session_factory = session_factory
+    
+    def data_version(self, db: Session, user_id: int) -> str:
+        """Fingerprint the user's profile, holdings and the latest prices they depend on"""
+        row = db.query(
+            User.email,
+            User.full_name,
+            User.updated_at,
+            func.count(func.distinct(Portfolio.id)),
+            func.max(func.coalesce(Portfolio.updated_at, Portfolio.created_at)),
+            func.count(Asset.id),
+            func.sum(Asset.id),
+            func.max(func.coalesce(Asset.updated_at, Asset.created_at)),
+            func.max(LatestPrice.timestamp)
+        ).select_from(User).outerjoin(
+            Portfolio, Portfolio.user_id == User.id
+        ).outerjoin(
+            Asset, Asset.portfolio_id == Portfolio.id
+        ).outerjoin(
+            LatestPrice,
+            (LatestPrice.symbol == Asset.symbol) & (LatestPrice.asset_type == Asset.asset_type)
+        ).filter(User.id == user_id).group_by(User.id).one()
+        
+        return hashlib.sha256("|".join(str(value) for value in row).encode()).hexdigest()[:16]
+    
+    def artifact_path(self, user_id: int, format: str, extension: str, version: str) -> Path:
+        return self.export_dir / f"{user_id}_{format}_{version}.{extension}"
+    
+    def create_job(self, db: Session, user_id: int, format: str, extension: str) -> ExportJob:
+        """Register an export job, completing it at once when a current artifact exists"""
+        now = datetime.now(timezone.utc)
+        # Jobs past their TTL are forgotten; their artifacts stay until a newer version replaces them
+        db.execute(delete(ExportJob).where(
+            ExportJob.user_id == user_id,
+            ExportJob.created_at < now - timedelta(seconds=settings.export_job_ttl_seconds)
+        ))
+        
+        job = ExportJob(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            format=format,
+            extension=extension,
+            status="pending",
+            cached=False,
+            created_at=now
+        )
+        
+        path = self.artifact_path(user_id, format, extension, self.data_version(db, user_id))
+        if path.exists():
+            job.status = "completed"
+            job.completed_at = now
+            job.path = str(path)
+            job.cached = True
+            logger.info(f"Serving {format} export for user {user_id} from cached artifact")
+        
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+    
+    def get_job(self, db: Session, job_id: str, user_id: int) -> Optional[ExportJob]:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.export_job_ttl_seconds)
+        return db.query(ExportJob).filter(
+            ExportJob.id == job_id,
+            ExportJob.user_id == user_id,
+            ExportJob.created_at >= cutoff
+        ).first()
+    
+    def run_job(self, job_id: str, render: ExportRenderer):
+        """Render a pending job's artifact to disk"""
+        db = self.session_factory()
+        try:
+            # Claim the job, so only one worker renders it
+            claimed = db.execute(
+                update(ExportJob).where(ExportJob.id == job_id, ExportJob.status == "pending").values(status="running")
+            )
+            db.commit()
+            if claimed.rowcount != 1:
+                return
+            
+            job = db.get(ExportJob, job_id)
+            try:
+                # Version before rendering so newer data never hides behind an older key
+                path = self.artifact_path(job.user_id, job.format, job.extension, self.data_version(db, job.user_id))
+                if not path.exists():
+                    self.export_dir.mkdir(parents=True, exist_ok=True)
+                    user = db.get(User, job.user_id)
+                    partial_path = path.with_name(f"{path.name}.{job.id}.part")
+                    with open(partial_path, "wb") as f:
+                        for chunk in render(db, user):
+                            f.write(chunk)
+                    os.replace(partial_path, path)
+                    self._remove_stale_artifacts(job.user_id, job.format, path)
+                else:
+                    job.cached = True
+                
+                job.path = str(path)
+                job.status = "completed"
+                job.completed_at = datetime.now(timezone.utc)
+                logger.info(f"Export job {job.id} ({job.format}) completed for user {job.user_id}")
+            except Exception as e:
+                db.rollback()
+                job.status = "failed"
+                job.error = "Error exporting data"
+                logger.error(f"Export job {job.id} failed for user {job.user_id}: {e}")
+            db.commit()
+        finally:
+            db.close()
+    
+    def _remove_stale_artifacts(self, user_id: int, format: str, current: Path):
+        """Drop artifacts of older data versions for the same user and format"""
+        for path in self.export_dir.glob(f"{user_id}_{format}_*"):
+            if path != current and not path.name.endswith(".part"):
+                try:
+                    path.unlink()
+                except OSError as e:
+                    logger.warning(f"Could not remove stale export {path}: {e}")
+
+
+export_service = ExportService(settings.export_dir)
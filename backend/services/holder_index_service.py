@@ -0,0 +1,114 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+from config import settings
+from models import SymbolHolder
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HolderKey = Tuple[str, str]
+
+# Session.info entry holding holder changes made in the open transaction
+PENDING_KEY = 'holder_index_changes'
+
+
+class HolderIndexService:
+    """Reverse index from (symbol, asset_type) to the portfolios and users holding it.
+    
+    The symbol_holders table is the source of truth and is written in the caller's
+    transaction. An in-memory copy answers lookups; local writes reach it once their
+    transaction commits, and it is reloaded once older than the refresh interval to
+    pick up writes made by other processes.
+    """
+    
+    def __init__(self, refresh_seconds: float, timer: Callable[[], float] = time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self.timer = timer
+        self.lock = threading.Lock()
+        self.holders: Dict[HolderKey, Dict[int, int]] = {}
+        self.loaded_at = None
+        event.listen(Session, "after_commit", self._apply_pending)
+        event.listen(Session, "after_rollback", self._discard_pending)
+    
+    def add_holding(self, db: Session, symbol: str, asset_type: str, portfolio_id: int, user_id: int) -> None:
+        """Record that a portfolio holds a symbol; the caller commits"""
+        insert = pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+        db.execute(
+            insert(SymbolHolder).values(
+                symbol=symbol, asset_type=asset_type, portfolio_id=portfolio_id, user_id=user_id
+            ).on_conflict_do_nothing()
+        )
+        db.info.setdefault(PENDING_KEY, []).append(('add', (symbol, asset_type), portfolio_id, user_id))
+    
+    def remove_portfolio(self, db: Session, portfolio_id: int) -> None:
+        """Forget every holding of a portfolio; the caller commits"""
+        db.execute(delete(SymbolHolder).where(SymbolHolder.portfolio_id == portfolio_id))
+        db.info.setdefault(PENDING_KEY, []).append(('remove', None, portfolio_id, None))
+    
+    def get_holders(self, db: Session, keys: Iterable[HolderKey]) -> Dict[HolderKey, Dict[int, int]]:
+        """Map each held (symbol, asset_type) to {portfolio_id: user_id}"""
+        self._ensure_loaded(db)
+        with self.lock:
+            return {key: dict(self.holders[key]) for key in set(keys) if key in self.holders}
+    
+    def get_holder_user_ids(self, db: Session, keys: Iterable[HolderKey]) -> Set[int]:
+        """Users holding any of the (symbol, asset_type) pairs"""
+        return {
+            user_id
+            for portfolios in self.get_holders(db, keys).values()
+            for user_id in portfolios.values()
+        }
+    
+    def get_held_keys(self, db: Session) -> List[HolderKey]:
+        """Every (symbol, asset_type) held by at least one portfolio"""
+        self._ensure_loaded(db)
+        with self.lock:
+            return list(self.holders)
+    
+    def invalidate(self) -> None:
+        with self.lock:
+            self.loaded_at = None
+    
+    def _apply_pending(self, session: Session) -> None:
+        """Session after_commit hook: apply the committed transaction's holder changes"""
+        changes = session.info.pop(PENDING_KEY, None)
+        if not changes:
+            return
+        with self.lock:
+            for action, key, portfolio_id, user_id in changes:
+                if action == 'add':
+                    self.holders.setdefault(key, {})[portfolio_id] = user_id
+                    continue
+                for held_key in [held_key for held_key, portfolios in self.holders.items() if portfolio_id in portfolios]:
+                    del self.holders[held_key][portfolio_id]
+                    if not self.holders[held_key]:
+                        del self.holders[held_key]
+    
+    def _discard_pending(self, session: Session) -> None:
+        """Session after_rollback hook: rolled-back holder changes never reach memory"""
+        session.info.pop(PENDING_KEY, None)
+    
+    def _ensure_loaded(self, db: Session) -> None:
+        with self.lock:
+            if self.loaded_at is not None and self.timer() - self.loaded_at < self.refresh_seconds:
+                return
+        
+        holders: Dict[HolderKey, Dict[int, int]] = {}
+        rows = db.execute(select(
+            SymbolHolder.symbol, SymbolHolder.asset_type, SymbolHolder.portfolio_id, SymbolHolder.user_id
+        ))
+        for symbol, asset_type, portfolio_id, user_id in rows:
+            holders.setdefault((symbol, asset_type), {})[portfolio_id] = user_id
+        
+        with self.lock:
+            self.holders = holders
+            self.loaded_at = self.timer()
+        logger.info(f"Loaded holder index for {len(holders)} symbols")
+
+
+holder_index_service = HolderIndexService(settings.holder_index_refresh_seconds)
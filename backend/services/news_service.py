@@ -0,0 +1,22 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List
+from models import News
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NewsService:
+    async def get_recent_news(self, db: AsyncSession, symbols: List[str], limit: int = 20) -> List[News]:
+        """Most recent articles mentioning any of the symbols"""
+        result = await db.execute(
+            select(News)
+            .where(News.symbol.in_(symbols))
+            .order_by(News.timestamp.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+
+news_service = NewsService()
@@ -1,16 +1,43 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, bindparam, select, update
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 from models import Portfolio, Asset, User
 from schemas import PortfolioCreate, AssetCreate
-from utils.encryption import encryption
-from services.price_service import price_service
+from utils.encryption import encryption, CIPHERTEXT_V2_PREFIX
+from services.price_service import price_service, PriceQuote
+from services.valuation_service import valuation_service
+from services.holder_index_service import holder_index_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class AssetValuationView:
+    """Read-only asset with valuation fields, kept outside the ORM identity map"""
+    
+    def __init__(self, asset: Asset, purchase_price: Decimal, current_price: Optional[Decimal], current_value: Optional[Decimal]):
+        self._asset = asset
+        self.purchase_price = purchase_price
+        self.current_price = current_price
+        self.current_value = current_value
+    
+    def __getattr__(self, name):
+        return getattr(self._asset, name)
+
+
+class PortfolioValuationView:
+    """Read-only portfolio whose assets carry valuation fields"""
+    
+    def __init__(self, portfolio: Portfolio, assets: List[AssetValuationView]):
+        self._portfolio = portfolio
+        self.assets = assets
+    
+    def __getattr__(self, name):
+        return getattr(self._portfolio, name)
+
+
 class PortfolioService:
     def create_portfolio(self, db: Session, portfolio: PortfolioCreate, user_id: int) -> Portfolio:
         """Create a new portfolio"""
@@ -20,6 +47,8 @@ class PortfolioService:
             user_id=user_id
         )
         db.add(db_portfolio)
+        db.flush()
+        valuation_service.init_portfolio_value(db, db_portfolio.id, user_id)
         db.commit()
         db.refresh(db_portfolio)
         return db_portfolio
@@ -34,34 +63,39 @@ class PortfolioService:
             and_(Portfolio.id == portfolio_id, Portfolio.user_id == user_id)
         ).first()
     
-    async def get_user_portfolios_with_valuations(self, db: Session, user_id: int) -> List[Portfolio]:
+    async def get_user_portfolios_with_valuations(self, db: AsyncSession, user_id: int) -> List[PortfolioValuationView]:
         """Get user portfolios with current asset valuations"""
-        portfolios = self.get_user_portfolios(db, user_id)
+        # Portfolios and all their assets in two queries
+        portfolios = (await db.execute(
+            select(Portfolio).options(selectinload(Portfolio.assets))
+            .where(Portfolio.user_id == user_id)
+            .order_by(Portfolio.id)
+        )).scalars().all()
         
-        for portfolio in portfolios:
-            # Load assets for each portfolio
-            portfolio.assets = db.query(Asset).filter(Asset.portfolio_id == portfolio.id).all()
-            
-            # Add current price and value to each asset
-            for asset in portfolio.assets:
-                latest_price = price_service.get_latest_price(db, asset.symbol, asset.asset_type)
-                if latest_price:
-                    asset.current_price = latest_price.price
-                    asset.current_value = asset.quantity * latest_price.price
-                else:
-                    asset.current_price = None
-                    asset.current_value = None
-                
-                # Decrypt purchase price for display
-                try:
-                    asset.purchase_price = Decimal(encryption.decrypt(asset.purchase_price_encrypted))
-                except Exception as e:
-                    logger.error(f"Error decrypting purchase price for asset {asset.id}: {e}")
-                    asset.purchase_price = Decimal('0')
-        
-        return portfolios
+        # Value every asset with one price lookup
+        assets = [asset for portfolio in portfolios for asset in portfolio.assets]
+        latest_prices = await price_service.get_latest_prices_async(
+            db, {(asset.symbol, asset.asset_type) for asset in assets}
+        )
+        valued_assets = self._value_assets_at(assets, latest_prices)
+        
+        return [
+            PortfolioValuationView(portfolio, [valued_assets[asset.id] for asset in portfolio.assets])
+            for portfolio in portfolios
+        ]
     
-    def create_asset(self, db: Session, asset: AssetCreate, portfolio_id: int, user_id: int) -> Optional[Asset]:
+    def get_portfolio_with_valuations(self, db: Session, portfolio_id: int, user_id: int) -> Optional[PortfolioValuationView]:
+        """Get a specific portfolio with current asset valuations"""
+        portfolio = db.query(Portfolio).options(selectinload(Portfolio.assets)).filter(
+            and_(Portfolio.id == portfolio_id, Portfolio.user_id == user_id)
+        ).first()
+        if not portfolio:
+            return None
+        
+        valued_assets = self._value_assets(db, portfolio.assets)
+        return PortfolioValuationView(portfolio, [valued_assets[asset.id] for asset in portfolio.assets])
+    
+    def create_asset(self, db: Session, asset: AssetCreate, portfolio_id: int, user_id: int) -> Optional[AssetValuationView]:
         """Create a new asset in a portfolio"""
         # Verify portfolio belongs to user
         portfolio = self.get_portfolio_by_id(db, portfolio_id, user_id)
@@ -83,41 +117,46 @@ class PortfolioService:
         )
         
         db.add(db_asset)
+        holder_index_service.add_holding(db, db_asset.symbol, db_asset.asset_type, portfolio_id, user_id)
+        valuation_service.mark_users_dirty(db, [user_id])
+        db.flush()
+        valuation_service.add_asset_cost(db, portfolio_id, asset.quantity * asset.purchase_price)
+        valuation_service.refresh_portfolio_values(db, [portfolio_id])
         db.commit()
         db.refresh(db_asset)
         
-        # Set decrypted purchase price for response
-        db_asset.purchase_price = asset.purchase_price
-        
-        return db_asset
+        # Decrypted purchase price for the response, without touching the ORM instance
+        return AssetValuationView(db_asset, asset.purchase_price, None, None)
     
-    def get_portfolio_assets(self, db: Session, portfolio_id: int, user_id: int) -> List[Asset]:
+    def get_portfolio_assets(self, db: Session, portfolio_id: int, user_id: int) -> List[AssetValuationView]:
         """Get all assets in a portfolio"""
-        # Verify portfolio belongs to user
-        portfolio = self.get_portfolio_by_id(db, portfolio_id, user_id)
-        if not portfolio:
-            return []
-        
-        assets = db.query(Asset).filter(Asset.portfolio_id == portfolio_id).all()
-        
-        # Decrypt purchase prices and add current valuations
+        portfolio = self.get_portfolio_with_valuations(db, portfolio_id, user_id)
+        return portfolio.assets if portfolio else []
+    
+    def _value_assets(self, db: Session, assets: List[Asset]) -> Dict[int, AssetValuationView]:
+        """Value assets by id with current price, current value and decrypted purchase price"""
+        latest_prices = price_service.get_latest_prices(
+            db, {(asset.symbol, asset.asset_type) for asset in assets}
+        )
+        return self._value_assets_at(assets, latest_prices)
+    
+    def _value_assets_at(self, assets: List[Asset], latest_prices: Dict[Tuple[str, str], PriceQuote]) -> Dict[int, AssetValuationView]:
+        valued_assets = {}
         for asset in assets:
+            latest_price = latest_prices.get((asset.symbol, asset.asset_type))
+            current_price = latest_price.price if latest_price else None
+            current_value = asset.quantity * current_price if latest_price else None
+            
+            # Decrypt purchase price for display
             try:
-                asset.purchase_price = Decimal(encryption.decrypt(asset.purchase_price_encrypted))
+                purchase_price = Decimal(encryption.decrypt(asset.purchase_price_encrypted))
             except Exception as e:
                 logger.error(f"Error decrypting purchase price for asset {asset.id}: {e}")
-                asset.purchase_price = Decimal('0')
+                purchase_price = Decimal('0')
             
-            # Add current price and value
-            latest_price = price_service.get_latest_price(db, asset.symbol, asset.asset_type)
-            if latest_price:
-                asset.current_price = latest_price.price
-                asset.current_value = asset.quantity * latest_price.price
-            else:
-                asset.current_price = None
-                asset.current_value = None
-        
-        return assets
+            valued_assets[asset.id] = AssetValuationView(asset, purchase_price, current_price, current_value)
+        
+        return valued_assets
     
     def update_portfolio(self, db: Session, portfolio_id: int, portfolio_update: dict, user_id: int) -> Optional[Portfolio]:
         """Update a portfolio"""
@@ -129,6 +168,8 @@ class PortfolioService:
             if hasattr(portfolio, key):
                 setattr(portfolio, key, value)
         
+        # Recompute so the next snapshot records the new name instead of carrying the old one forward
+        valuation_service.mark_users_dirty(db, [user_id])
         db.commit()
         db.refresh(portfolio)
         return portfolio
@@ -139,13 +180,54 @@ class PortfolioService:
         if not portfolio:
             return False
         
-        # Delete all assets first
+        # Delete all assets and their holder index entries first
         db.query(Asset).filter(Asset.portfolio_id == portfolio_id).delete()
+        holder_index_service.remove_portfolio(db, portfolio_id)
+        valuation_service.remove_portfolio_value(db, portfolio_id)
         
         # Delete portfolio
         db.delete(portfolio)
+        valuation_service.mark_users_dirty(db, [user_id])
         db.commit()
         return True
+    
+    def reencrypt_legacy_purchase_prices(self, db: Session, after_id: int = 0, batch_size: int = 1000) -> Tuple[Optional[int], int]:
+        """Rewrite one batch of legacy purchase prices in the compact format.
+        
+        Returns the last asset id scanned (None once no legacy rows remain) and the number rewritten.
+        """
+        legacy_assets = db.execute(
+            select(Asset.id, Asset.purchase_price_encrypted)
+            .where(
+                Asset.id > after_id,
+                Asset.purchase_price_encrypted.notlike(f"{CIPHERTEXT_V2_PREFIX}%")
+            )
+            .order_by(Asset.id)
+            .limit(batch_size)
+        ).all()
+        if not legacy_assets:
+            return None, 0
+        
+        rows = []
+        for asset_id, purchase_price_encrypted in legacy_assets:
+            try:
+                ciphertext = encryption.encrypt(encryption.decrypt(purchase_price_encrypted))
+            except Exception as e:
+                logger.error(f"Error re-encrypting purchase price for asset {asset_id}: {e}")
+                continue
+            rows.append({'asset_id': asset_id, 'ciphertext': ciphertext})
+        
+        if rows:
+            assets_table = Asset.__table__
+            db.execute(
+                update(assets_table)
+                .where(assets_table.c.id == bindparam('asset_id'))
+                .values(purchase_price_encrypted=bindparam('ciphertext')),
+                rows
+            )
+            db.commit()
+        
+        return legacy_assets[-1].id, len(rows)
 
 
 portfolio_service = PortfolioService()
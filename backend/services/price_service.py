@@ -1,19 +1,162 @@
-import requests
-from typing import Dict, Optional
+import asyncio
+import httpx
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from config import settings
-from models import PriceSnapshot
+from models import PriceSnapshot, LatestPrice, PriceRollup
+from services.rate_limiter import RateLimiter
+from services.valuation_service import valuation_service
+from utils.cache import TTLCache, MISSING
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Symbol to CoinGecko ID (simplified mapping); unknown symbols fall back to their lowercase form
+COINGECKO_IDS = {
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'ADA': 'cardano',
+    'DOT': 'polkadot',
+    'LINK': 'chainlink',
+    'LTC': 'litecoin',
+    'XRP': 'ripple',
+    'BCH': 'bitcoin-cash',
+    'BNB': 'binancecoin',
+    'SOL': 'solana'
+}
+
+# Keep the comma-separated ids parameter well under common URL length limits
+COINGECKO_MAX_IDS_LENGTH = 1500
+
+# Prices are stored as DECIMAL(20, 8)
+PRICE_QUANTUM = Decimal("0.00000001")
+
+# Rollup intervals served by price history, as stored in price_rollups.interval
+ROLLUP_INTERVALS = {'1h': 'hour', '1d': 'day'}
+
+
+def rollup_bucket_start(timestamp: datetime, interval: str) -> datetime:
+    """Start of the hour or day bucket containing timestamp"""
+    if interval == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class PriceQuote(NamedTuple):
+    """Immutable copy of a latest price, safe to share across sessions"""
+    symbol: str
+    asset_type: str
+    price: Decimal
+    currency: str
+    timestamp: datetime
+    source: str
+    
+    @classmethod
+    def from_latest(cls, latest: LatestPrice) -> "PriceQuote":
+        return cls(
+            symbol=latest.symbol,
+            asset_type=latest.asset_type,
+            price=latest.price,
+            currency=latest.currency,
+            timestamp=latest.timestamp,
+            source=latest.source
+        )
+
 
 class PriceService:
     def __init__(self):
         self.alpha_vantage_base_url = "https://www.alphavantage.co/query"
         self.coingecko_base_url = "https://api.coingecko.com/api/v3"
+        # Keyed on (symbol, asset_type); None is cached for symbols without a price
+        self.latest_price_cache = TTLCache(
+            max_size=settings.price_cache_max_size,
+            ttl_seconds=settings.price_cache_ttl_seconds
+        )
+        # Bound the number of in-flight requests per provider
+        self.provider_slots = {
+            'alpha_vantage': asyncio.Semaphore(settings.alpha_vantage_max_concurrency),
+            'coingecko': asyncio.Semaphore(settings.coingecko_max_concurrency)
+        }
+        # Pace each provider at the rate its plan allows
+        self.rate_limiters = {
+            'alpha_vantage': RateLimiter(
+                'alpha_vantage',
+                rate_per_second=settings.alpha_vantage_rate_per_second,
+                burst=settings.alpha_vantage_burst,
+                daily_quota=settings.alpha_vantage_daily_quota
+            ),
+            'coingecko': RateLimiter(
+                'coingecko',
+                rate_per_second=settings.coingecko_rate_per_second,
+                burst=settings.coingecko_burst,
+                daily_quota=settings.coingecko_daily_quota
+            )
+        }
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Shared pooled HTTP client, created on first use"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=settings.price_http_timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=settings.price_http_max_connections,
+                    max_keepalive_connections=settings.price_http_max_connections
+                )
+            )
+        return self._http_client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    async def _get_json(self, provider: str, url: str, params: Dict, headers: Optional[Dict] = None) -> Dict:
+        """GET a provider endpoint, honoring its rate limit and retrying throttled requests"""
+        rate_limiter = self.rate_limiters[provider]
+        
+        for attempt in range(settings.price_max_retries + 1):
+            await rate_limiter.acquire()
+            async with self.provider_slots[provider]:
+                response = await self.http_client.get(url, params=params, headers=headers)
+            
+            if response.status_code == 429:
+                retry_after = self._retry_after_seconds(response)
+            else:
+                response.raise_for_status()
+                data = response.json()
+                # Alpha Vantage reports throttling as a 200 with a "Note"/"Information" message
+                if not (provider == 'alpha_vantage' and ('Note' in data or 'Information' in data)):
+                    return data
+                retry_after = None
+            
+            if attempt == settings.price_max_retries:
+                break
+            
+            delay = retry_after if retry_after is not None else settings.price_retry_backoff_seconds * 2 ** attempt
+            logger.warning(f"{provider} throttled request, retrying in {delay:.1f}s")
+            rate_limiter.backoff(delay)
+        
+        raise RuntimeError(f"{provider} still throttling after {settings.price_max_retries} retries")
+    
+    def _retry_after_seconds(self, response: httpx.Response) -> Optional[float]:
+        """Parse a delay-seconds Retry-After header"""
+        try:
+            return max(float(response.headers['Retry-After']), 0.0)
+        except (KeyError, ValueError):
+            return None
+    
+    def rate_limit_status(self) -> Dict[str, Dict]:
+        """Return each provider's rate limiter state and remaining quota"""
+        return {provider: rate_limiter.status() for provider, rate_limiter in self.rate_limiters.items()}
     
     async def fetch_stock_price(self, symbol: str) -> Optional[Dict]:
         """Fetch stock price from Alpha Vantage"""
@@ -24,10 +167,7 @@ class PriceService:
                 'apikey': settings.alpha_vantage_api_key
             }
             
-            response = requests.get(self.alpha_vantage_base_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._get_json('alpha_vantage', self.alpha_vantage_base_url, params)
             
             if 'Global Quote' in data:
                 quote = data['Global Quote']
@@ -52,26 +192,63 @@ class PriceService:
     
     async def fetch_crypto_price(self, symbol: str) -> Optional[Dict]:
         """Fetch crypto price from CoinGecko"""
+        prices = await self.fetch_crypto_prices([symbol])
+        return prices.get(symbol.upper())
+    
+    async def fetch_crypto_prices(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Fetch many crypto prices from CoinGecko using multi-id requests"""
+        # Several symbols may share an ID, so map each ID back to all of them
+        symbols_by_id: Dict[str, List[str]] = {}
+        for symbol in {symbol.upper() for symbol in symbols}:
+            crypto_id = COINGECKO_IDS.get(symbol, symbol.lower())
+            symbols_by_id.setdefault(crypto_id, []).append(symbol)
+        
+        chunks = self._chunk_crypto_ids(sorted(symbols_by_id))
+        results = await asyncio.gather(*(self._fetch_crypto_chunk(chunk) for chunk in chunks))
+        
+        prices = {}
+        for data in results:
+            for crypto_id, price_data in data.items():
+                for symbol in symbols_by_id.get(crypto_id, []):
+                    prices[symbol] = {
+                        'symbol': symbol,
+                        'price': Decimal(str(price_data['usd'])),
+                        'currency': 'USD',
+                        'source': 'coingecko',
+                        'metadata': {
+                            '24h_change': price_data.get('usd_24h_change'),
+                            '24h_volume': price_data.get('usd_24h_vol')
+                        }
+                    }
+        
+        missing = [symbol for crypto_symbols in symbols_by_id.values() for symbol in crypto_symbols if symbol not in prices]
+        if missing:
+            logger.error(f"No price data for crypto {', '.join(sorted(missing))}")
+        
+        return prices
+    
+    def _chunk_crypto_ids(self, crypto_ids: List[str]) -> List[List[str]]:
+        """Split IDs into groups whose comma-joined length fits in one URL"""
+        chunks = []
+        chunk, chunk_length = [], 0
+        for crypto_id in crypto_ids:
+            added_length = len(crypto_id) + (1 if chunk else 0)
+            if chunk and chunk_length + added_length > COINGECKO_MAX_IDS_LENGTH:
+                chunks.append(chunk)
+                chunk, chunk_length = [], 0
+                added_length = len(crypto_id)
+            chunk.append(crypto_id)
+            chunk_length += added_length
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    async def _fetch_crypto_chunk(self, crypto_ids: List[str]) -> Dict:
+        """Fetch one /simple/price request for a group of IDs"""
         try:
-            # Convert symbol to CoinGecko ID (simplified mapping)
-            crypto_id_map = {
-                'BTC': 'bitcoin',
-                'ETH': 'ethereum',
-                'ADA': 'cardano',
-                'DOT': 'polkadot',
-                'LINK': 'chainlink',
-                'LTC': 'litecoin',
-                'XRP': 'ripple',
-                'BCH': 'bitcoin-cash',
-                'BNB': 'binancecoin',
-                'SOL': 'solana'
-            }
-            
-            crypto_id = crypto_id_map.get(symbol.upper(), symbol.lower())
-            
             url = f"{self.coingecko_base_url}/simple/price"
             params = {
-                'ids': crypto_id,
+                'ids': ','.join(crypto_ids),
                 'vs_currencies': 'usd',
                 'include_24hr_change': 'true',
                 'include_24hr_vol': 'true'
@@ -81,71 +258,243 @@ class PriceService:
             if settings.coingecko_api_key:
                 headers['X-CG-Demo-API-Key'] = settings.coingecko_api_key
             
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._get_json('coingecko', url, params, headers)
+            return {crypto_id: price_data for crypto_id, price_data in data.items() if 'usd' in price_data}
             
-            if crypto_id in data:
-                price_data = data[crypto_id]
-                return {
-                    'symbol': symbol.upper(),
-                    'price': Decimal(str(price_data['usd'])),
-                    'currency': 'USD',
-                    'source': 'coingecko',
-                    'metadata': {
-                        '24h_change': price_data.get('usd_24h_change'),
-                        '24h_volume': price_data.get('usd_24h_vol')
-                    }
-                }
-            else:
-                logger.error(f"No price data for crypto {symbol}: {data}")
-                return None
-                
         except Exception as e:
-            logger.error(f"Error fetching crypto price for {symbol}: {e}")
-            return None
+            logger.error(f"Error fetching crypto prices for {len(crypto_ids)} ids: {e}")
+            return {}
     
-    async def fetch_and_store_price(self, db: Session, symbol: str, asset_type: str) -> Optional[PriceSnapshot]:
+    async def fetch_price(self, symbol: str, asset_type: str) -> Optional[Dict]:
+        """Fetch price from the provider for the asset type"""
+        if asset_type.lower() == 'stock':
+            return await self.fetch_stock_price(symbol)
+        elif asset_type.lower() == 'crypto':
+            return await self.fetch_crypto_price(symbol)
+        return None
+    
+    async def fetch_and_store_price(self, db: Session, symbol: str, asset_type: str) -> Optional[Dict]:
         """Fetch price and store in database"""
         try:
-            price_data = None
-            
-            if asset_type.lower() == 'stock':
-                price_data = await self.fetch_stock_price(symbol)
-            elif asset_type.lower() == 'crypto':
-                price_data = await self.fetch_crypto_price(symbol)
+            price_data = await self.fetch_price(symbol, asset_type)
             
             if price_data:
-                # Store in database
-                price_snapshot = PriceSnapshot(
-                    symbol=price_data['symbol'],
-                    asset_type=asset_type,
-                    price=price_data['price'],
-                    currency=price_data['currency'],
-                    source=price_data['source'],
-                    metadata=price_data.get('metadata')
-                )
-                
-                db.add(price_snapshot)
-                db.commit()
-                db.refresh(price_snapshot)
-                
-                return price_snapshot
+                self.store_price(db, asset_type, price_data)
             
-            return None
+            return price_data
             
         except Exception as e:
             logger.error(f"Error storing price for {symbol}: {e}")
             db.rollback()
             return None
     
-    def get_latest_price(self, db: Session, symbol: str, asset_type: str) -> Optional[PriceSnapshot]:
-        """Get latest price from database"""
-        return db.query(PriceSnapshot).filter(
-            PriceSnapshot.symbol == symbol,
-            PriceSnapshot.asset_type == asset_type
-        ).order_by(PriceSnapshot.timestamp.desc()).first()
+    def store_price(self, db: Session, asset_type: str, price_data: Dict) -> None:
+        """Store a fetched price and make it the latest price for its symbol"""
+        self.store_prices_bulk(db, [{**price_data, 'asset_type': asset_type}])
+    
+    def store_prices_bulk(self, db: Session, snapshots: List[Dict]) -> int:
+        """Insert many fetched prices with one executemany and update latest prices in the same transaction"""
+        if not snapshots:
+            return 0
+        
+        # Every price in a batch shares the time it was stored
+        timestamp = datetime.now(timezone.utc)
+        rows = [
+            {
+                'symbol': snapshot['symbol'],
+                'asset_type': snapshot['asset_type'],
+                'price': snapshot['price'],
+                'currency': snapshot.get('currency', 'USD'),
+                'timestamp': timestamp,
+                'source': snapshot['source'],
+                'metadata': snapshot.get('metadata')
+            }
+            for snapshot in snapshots
+        ]
+        
+        try:
+            db.execute(PriceSnapshot.__table__.insert(), rows)
+            self._upsert_latest_prices(db, rows)
+            self.upsert_rollups(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        # Invalidate after commit; readers that queried before it cannot cache the old price,
+        # since their cache writes carry the generation read before their query
+        for row in rows:
+            self.latest_price_cache.invalidate((row['symbol'], row['asset_type']))
+        
+        return len(rows)
+    
+    def _upsert_latest_prices(self, db: Session, rows: List[Dict]) -> None:
+        """Point latest_prices at new price rows unless a newer one is already recorded.
+        
+        Holders of prices that actually moved are flagged for revaluation.
+        """
+        insert = pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+        
+        stmt = insert(LatestPrice)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LatestPrice.symbol, LatestPrice.asset_type],
+            set_={
+                'price': stmt.excluded.price,
+                'currency': stmt.excluded.currency,
+                'timestamp': stmt.excluded.timestamp,
+                'source': stmt.excluded.source
+            },
+            where=LatestPrice.timestamp <= stmt.excluded.timestamp
+        )
+        
+        # One row per key, as a multi-row upsert may not touch the same row twice
+        latest_rows = {
+            (row['symbol'], row['asset_type']): {
+                'symbol': row['symbol'],
+                'asset_type': row['asset_type'],
+                'price': row['price'],
+                'currency': row['currency'],
+                'timestamp': row['timestamp'],
+                'source': row['source']
+            }
+            for row in rows
+        }
+        
+        previous_prices = dict(
+            ((symbol, asset_type), price)
+            for symbol, asset_type, price in db.query(
+                LatestPrice.symbol, LatestPrice.asset_type, LatestPrice.price
+            ).filter(tuple_(LatestPrice.symbol, LatestPrice.asset_type).in_(list(latest_rows)))
+        )
+        changed_keys = [
+            key for key, row in latest_rows.items()
+            if previous_prices.get(key) != Decimal(str(row['price'])).quantize(PRICE_QUANTUM)
+        ]
+        
+        db.execute(stmt, list(latest_rows.values()))
+        valuation_service.mark_holders_dirty(db, changed_keys)
+        valuation_service.refresh_holder_values(db, changed_keys)
+    
+    def upsert_rollups(self, db: Session, rows: List[Dict]) -> None:
+        """Fold price rows into their hourly and daily OHLC buckets; the caller commits"""
+        buckets = {}
+        for row in sorted(rows, key=lambda row: row['timestamp']):
+            price = Decimal(str(row['price']))
+            for interval in ROLLUP_INTERVALS.values():
+                key = (row['symbol'], row['asset_type'], interval, rollup_bucket_start(row['timestamp'], interval))
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = {
+                        'symbol': key[0],
+                        'asset_type': key[1],
+                        'interval': interval,
+                        'bucket_start': key[3],
+                        'open': price,
+                        'high': price,
+                        'low': price,
+                        'close': price,
+                        'close_timestamp': row['timestamp'],
+                        'sample_count': 1
+                    }
+                else:
+                    bucket['high'] = max(bucket['high'], price)
+                    bucket['low'] = min(bucket['low'], price)
+                    bucket['close'] = price
+                    bucket['close_timestamp'] = row['timestamp']
+                    bucket['sample_count'] += 1
+        
+        if not buckets:
+            return
+        
+        insert = pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+        stmt = insert(PriceRollup)
+        excluded = stmt.excluded
+        newer = excluded.close_timestamp >= PriceRollup.close_timestamp
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PriceRollup.symbol, PriceRollup.asset_type, PriceRollup.interval, PriceRollup.bucket_start],
+            set_={
+                'high': case((excluded.high > PriceRollup.high, excluded.high), else_=PriceRollup.high),
+                'low': case((excluded.low < PriceRollup.low, excluded.low), else_=PriceRollup.low),
+                'close': case((newer, excluded.close), else_=PriceRollup.close),
+                'close_timestamp': case((newer, excluded.close_timestamp), else_=PriceRollup.close_timestamp),
+                'sample_count': PriceRollup.sample_count + excluded.sample_count
+            }
+        )
+        db.execute(stmt, list(buckets.values()))
+    
+    def get_price_history(
+        self,
+        db: Session,
+        symbol: str,
+        asset_type: str,
+        interval: str,
+        start: datetime,
+        end: datetime
+    ) -> List[PriceRollup]:
+        """OHLC buckets for a symbol between start and end, oldest first"""
+        query = select(PriceRollup).where(
+            PriceRollup.symbol == symbol,
+            PriceRollup.asset_type == asset_type,
+            PriceRollup.interval == ROLLUP_INTERVALS[interval],
+            PriceRollup.bucket_start >= rollup_bucket_start(start, ROLLUP_INTERVALS[interval]),
+            PriceRollup.bucket_start <= end
+        ).order_by(PriceRollup.bucket_start)
+        return db.execute(query).scalars().all()
+    
+    def get_latest_price(self, db: Session, symbol: str, asset_type: str) -> Optional[PriceQuote]:
+        """Get latest price, from cache when possible"""
+        return self.get_latest_prices(db, [(symbol, asset_type)]).get((symbol, asset_type))
+    
+    def get_latest_prices(
+        self, db: Session, keys: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], PriceQuote]:
+        """Get latest prices for many (symbol, asset_type) pairs, querying only cache misses"""
+        quotes, missing_keys = self._cached_quotes(keys)
+        if not missing_keys:
+            return quotes
+        
+        latest_prices = db.execute(self._latest_prices_query(missing_keys)).scalars().all()
+        return self._cache_quotes(quotes, missing_keys, latest_prices)
+    
+    async def get_latest_prices_async(
+        self, db: AsyncSession, keys: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], PriceQuote]:
+        """Async variant of get_latest_prices for request handlers"""
+        quotes, missing_keys = self._cached_quotes(keys)
+        if not missing_keys:
+            return quotes
+        
+        latest_prices = (await db.execute(self._latest_prices_query(missing_keys))).scalars().all()
+        return self._cache_quotes(quotes, missing_keys, latest_prices)
+    
+    def _cached_quotes(self, keys: Iterable[Tuple[str, str]]) -> Tuple[Dict[Tuple[str, str], PriceQuote], Dict[Tuple[str, str], int]]:
+        """Split keys into cached quotes and the keys still to be queried, with their cache generation"""
+        quotes = {}
+        missing_keys = {}
+        
+        for key in set(keys):
+            quote = self.latest_price_cache.get(key)
+            if quote is MISSING:
+                missing_keys[key] = self.latest_price_cache.generation(key)
+            elif quote is not None:
+                quotes[key] = quote
+        
+        return quotes, missing_keys
+    
+    def _latest_prices_query(self, keys: Iterable[Tuple[str, str]]):
+        return select(LatestPrice).where(tuple_(LatestPrice.symbol, LatestPrice.asset_type).in_(list(keys)))
+    
+    def _cache_quotes(
+        self, quotes: Dict[Tuple[str, str], PriceQuote], missing_keys: Dict[Tuple[str, str], int], latest_prices: List[LatestPrice]
+    ) -> Dict[Tuple[str, str], PriceQuote]:
+        """Add queried prices to quotes and cache every missed key, including those without a price"""
+        for latest in latest_prices:
+            quotes[(latest.symbol, latest.asset_type)] = PriceQuote.from_latest(latest)
+        
+        for key, generation in missing_keys.items():
+            self.latest_price_cache.set(key, quotes.get(key), generation=generation)
+        
+        return quotes
 
 
 price_service = PriceService()
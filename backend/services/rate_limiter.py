@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import time
+
+
+class QuotaExceededError(Exception):
+    """Raised when a provider's daily request quota is used up"""
+
+
+class RateLimiter:
+    """Token bucket with an optional daily quota for one price provider"""
+    
+    def __init__(
+        self,
+        name: str,
+        rate_per_second: float,
+        burst: int,
+        daily_quota: Optional[int] = None,
+        timer: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.timer = timer
+        self.tokens = float(burst)
+        self.updated_at = timer()
+        self.paused_until = 0.0
+        self.quota_day = datetime.now(timezone.utc).date()
+        self.quota_used = 0
+        self._lock = asyncio.Lock()
+    
+    @property
+    def remaining_quota(self) -> Optional[int]:
+        """Requests left today, or None when the provider has no daily quota"""
+        self._reset_quota_if_new_day()
+        if self.daily_quota is None:
+            return None
+        return max(self.daily_quota - self.quota_used, 0)
+    
+    async def acquire(self) -> None:
+        """Wait until a request may be sent, then consume a token"""
+        async with self._lock:
+            if self.remaining_quota == 0:
+                raise QuotaExceededError(f"Daily quota of {self.daily_quota} requests exhausted for {self.name}")
+            
+            while True:
+                now = self.timer()
+                self._refill(now)
+                
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.quota_used += 1
+                        return
+                    wait = (1 - self.tokens) / self.rate_per_second
+                
+                await asyncio.sleep(wait)
+    
+    def backoff(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, e.g. after a 429 response"""
+        self.paused_until = max(self.paused_until, self.timer() + seconds)
+        self.tokens = 0.0
+    
+    def status(self) -> Dict[str, Any]:
+        """Return limiter configuration and remaining quota for monitoring"""
+        return {
+            'rate_per_second': self.rate_per_second,
+            'burst': self.burst,
+            'daily_quota': self.daily_quota,
+            'remaining_quota': self.remaining_quota,
+            'paused_for_seconds': max(self.paused_until - self.timer(), 0.0)
+        }
+    
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate_per_second)
+    
+    def _reset_quota_if_new_day(self) -> None:
+        today = datetime.now(timezone.utc).date()
+        if today != self.quota_day:
+            self.quota_day = today
+            self.quota_used = 0
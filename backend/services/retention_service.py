@@ -0,0 +1,164 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, exists, func, select, text
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta, timezone
+from config import settings
+from models import PriceSnapshot, NetWorthSnapshot, NetWorthSnapshotItem
+from services.valuation_service import time_bucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by month on "timestamp" (Postgres only)
+PARTITIONED_TABLES = ['price_snapshots', 'networth_snapshots']
+
+# Net worth days already thinned are not rescanned; a run missed for longer leaves older days as they are
+COMPACTION_LOOKBACK = timedelta(days=7)
+
+# Snapshot ids deleted per statement while compacting
+COMPACTION_BATCH_SIZE = 1000
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class RetentionService:
+    def is_partitioned(self, db: Session) -> bool:
+        return db.get_bind().dialect.name == 'postgresql'
+    
+    def ensure_partitions(self, db: Session, today: date, months_ahead: int) -> List[str]:
+        """Create any missing monthly partitions from this month through months_ahead"""
+        created = []
+        for table in PARTITIONED_TABLES:
+            existing = set(self.list_partitions(db, table))
+            month = today.replace(day=1)
+            for _ in range(months_ahead + 1):
+                name = f"{table}_{month:%Y%m}"
+                if name not in existing:
+                    self.create_partition(db, table, name, month)
+                    created.append(name)
+                month = add_months(month, 1)
+        db.commit()
+        return created
+    
+    def create_partition(self, db: Session, table: str, name: str, month: date) -> None:
+        """Attach a monthly partition, moving in any of its rows that landed in the default partition"""
+        start, end = month, add_months(month, 1)
+        db.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+        # The attach fails while the default partition still holds rows in the new range
+        db.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default
+                WHERE "timestamp" >= :start AND "timestamp" < :end
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), {'start': start, 'end': end})
+        db.execute(text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+    
+    def ensure_current_partitions(self, db: Session, today: Optional[date] = None) -> List[str]:
+        """Make sure this month's and next month's partitions exist; a no-op off Postgres"""
+        if not self.is_partitioned(db):
+            return []
+        return self.ensure_partitions(db, today or datetime.now(timezone.utc).date(), 1)
+    
+    def list_partitions(self, db: Session, table: str) -> List[str]:
+        return db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            WHERE parent.relname = :table
+        """), {'table': table}).scalars().all()
+    
+    def drop_expired_partitions(self, db: Session, table: str, cutoff: datetime) -> List[str]:
+        """Drop monthly partitions that end on or before cutoff"""
+        dropped = []
+        for name in sorted(self.list_partitions(db, table)):
+            suffix = name[len(table) + 1:]
+            if not suffix.isdigit() or len(suffix) != 6:
+                continue
+            month_end = add_months(date(int(suffix[:4]), int(suffix[4:]), 1), 1)
+            if month_end <= cutoff.date():
+                db.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        db.commit()
+        return dropped
+    
+    def purge_price_snapshots(self, db: Session, cutoff: datetime) -> int:
+        """Delete raw price snapshots older than cutoff; their hourly and daily rollups stay"""
+        result = db.execute(delete(PriceSnapshot).where(PriceSnapshot.timestamp < cutoff))
+        db.commit()
+        return result.rowcount
+    
+    def compact_networth_snapshots(self, db: Session, cutoff: datetime) -> int:
+        """Thin net worth snapshots older than cutoff to the last one per user per day"""
+        day = time_bucket(db, 'day', NetWorthSnapshot.timestamp)
+        ranked = select(
+            NetWorthSnapshot.id,
+            func.row_number().over(
+                partition_by=(NetWorthSnapshot.user_id, day),
+                order_by=(NetWorthSnapshot.timestamp.desc(), NetWorthSnapshot.id.desc())
+            ).label('day_rank')
+        ).where(
+            NetWorthSnapshot.timestamp >= cutoff - COMPACTION_LOOKBACK,
+            NetWorthSnapshot.timestamp < cutoff
+        ).subquery()
+        snapshot_ids = db.execute(select(ranked.c.id).where(ranked.c.day_rank > 1)).scalars().all()
+        
+        for start in range(0, len(snapshot_ids), COMPACTION_BATCH_SIZE):
+            batch = snapshot_ids[start:start + COMPACTION_BATCH_SIZE]
+            # Snapshots whose items the batch shares; deleting the batch may remove their last owner
+            sources = db.execute(
+                select(NetWorthSnapshot.breakdown_snapshot_id).where(
+                    NetWorthSnapshot.id.in_(batch),
+                    NetWorthSnapshot.breakdown_snapshot_id.isnot(None)
+                ).distinct()
+            ).scalars().all()
+            db.execute(
+                delete(NetWorthSnapshot).where(NetWorthSnapshot.id.in_(batch)),
+                execution_options={'synchronize_session': False}
+            )
+            self._delete_orphaned_items(db, set(batch) | set(sources))
+        db.commit()
+        return len(snapshot_ids)
+    
+    def _delete_orphaned_items(self, db: Session, snapshot_ids) -> None:
+        """Delete items of the given snapshot ids once neither that snapshot nor a carried-forward copy remains"""
+        db.execute(
+            delete(NetWorthSnapshotItem).where(
+                NetWorthSnapshotItem.snapshot_id.in_(snapshot_ids),
+                ~exists().where(NetWorthSnapshot.id == NetWorthSnapshotItem.snapshot_id),
+                ~exists().where(NetWorthSnapshot.breakdown_snapshot_id == NetWorthSnapshotItem.snapshot_id)
+            ),
+            execution_options={'synchronize_session': False}
+        )
+    
+    def apply_retention(self, db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Run the whole retention policy and report what it removed"""
+        now = now or datetime.now(timezone.utc)
+        price_cutoff = now - timedelta(days=settings.price_snapshot_retention_days)
+        networth_cutoff = now - timedelta(days=settings.networth_snapshot_compaction_days)
+        
+        dropped = []
+        if self.is_partitioned(db):
+            self.ensure_partitions(db, now.date(), settings.snapshot_partition_months_ahead)
+            # Whole months go by dropping their partition; the boundary month is trimmed by delete
+            dropped = self.drop_expired_partitions(db, 'price_snapshots', price_cutoff)
+        
+        purged = self.purge_price_snapshots(db, price_cutoff)
+        compacted = self.compact_networth_snapshots(db, networth_cutoff)
+        
+        logger.info(
+            f"Retention: dropped {len(dropped)} price partitions, purged {purged} price snapshots, "
+            f"compacted {compacted} net worth snapshots"
+        )
+        return {'dropped_partitions': len(dropped), 'purged_prices': purged, 'compacted_snapshots': compacted}
+
+
+retention_service = RetentionService()
@@ -0,0 +1,685 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session, aliased, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, bindparam, create_engine, delete, exists, func, literal, or_, select, tuple_, update, DateTime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import settings
+from models import (
+    Asset, Portfolio, User, LatestPrice, NetWorthSnapshot, NetWorthSnapshotItem, PortfolioValue, SymbolHolder,
+    ValuationDirtyUser
+)
+from utils.encryption import encryption
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# History bucket widths, as date_trunc units
+HISTORY_INTERVALS = {'1h': 'hour', '1d': 'day', '1w': 'week', '1M': 'month'}
+
+# SQLite has no date_trunc; buckets are labelled with strftime instead
+SQLITE_BUCKET_FORMATS = {'hour': '%Y-%m-%d %H', 'day': '%Y-%m-%d', 'week': '%Y-%W', 'month': '%Y-%m'}
+
+
+def time_bucket(db: Session, unit: str, column):
+    """SQL expression grouping a timestamp column into hour/day/week/month buckets"""
+    if db.get_bind().dialect.name == 'postgresql':
+        return func.date_trunc(unit, column)
+    return func.strftime(SQLITE_BUCKET_FORMATS[unit], column)
+
+
+@dataclass
+class AssetValuation:
+    asset_id: int
+    symbol: str
+    name: str
+    asset_type: str
+    quantity: Decimal
+    purchase_price: Decimal
+    purchase_date: datetime
+    current_price: Optional[Decimal]
+    current_value: Optional[Decimal]
+
+
+@dataclass
+class PortfolioValuation:
+    portfolio_id: int
+    name: str
+    value: Decimal = Decimal('0')
+    assets: List[AssetValuation] = field(default_factory=list)
+    
+    @property
+    def cost_basis(self) -> Decimal:
+        return sum((asset.quantity * asset.purchase_price for asset in self.assets), Decimal('0'))
+
+
+@dataclass
+class UserValuation:
+    user_id: int
+    total_value: Decimal = Decimal('0')
+    portfolios: List[PortfolioValuation] = field(default_factory=list)
+    
+    def snapshot_items(self) -> List[Dict]:
+        """Rows stored in networth_snapshot_items: a total per portfolio plus each priced asset"""
+        items = []
+        for portfolio in self.portfolios:
+            items.append({
+                'portfolio_id': portfolio.portfolio_id,
+                'asset_id': None,
+                'portfolio_name': portfolio.name,
+                'symbol': None,
+                'asset_type': None,
+                'quantity': None,
+                'price': None,
+                'value': portfolio.value
+            })
+            items.extend(
+                {
+                    'portfolio_id': portfolio.portfolio_id,
+                    'asset_id': asset.asset_id,
+                    'portfolio_name': portfolio.name,
+                    'symbol': asset.symbol,
+                    'asset_type': asset.asset_type,
+                    'quantity': asset.quantity,
+                    'price': asset.current_price,
+                    'value': asset.current_value
+                }
+                for asset in portfolio.assets
+                if asset.current_price is not None
+            )
+        return items
+    
+    def current_breakdown(self) -> Dict:
+        """Build the portfolio_breakdown returned by /networth/current"""
+        portfolio_breakdown = {}
+        for portfolio in self.portfolios:
+            portfolio_breakdown[portfolio.name] = {
+                'id': portfolio.portfolio_id,
+                'value': float(portfolio.value),
+                'assets': [
+                    {
+                        'symbol': asset.symbol,
+                        'name': asset.name,
+                        'asset_type': asset.asset_type,
+                        'quantity': float(asset.quantity),
+                        'purchase_price': float(asset.purchase_price),
+                        'current_price': float(asset.current_price) if asset.current_price is not None else None,
+                        'current_value': float(asset.current_value or 0),
+                        'purchase_date': asset.purchase_date.isoformat()
+                    }
+                    for asset in portfolio.assets
+                ]
+            }
+        return portfolio_breakdown
+
+
+@dataclass
+class HoldingRow:
+    """One asset of a user's portfolio, or the portfolio alone when it has no assets"""
+    portfolio_id: int
+    portfolio_name: str
+    portfolio_description: Optional[str]
+    portfolio_created_at: datetime
+    asset_id: Optional[int] = None
+    symbol: Optional[str] = None
+    name: Optional[str] = None
+    asset_type: Optional[str] = None
+    quantity: Optional[Decimal] = None
+    purchase_price: Optional[Decimal] = None
+    purchase_date: Optional[datetime] = None
+    metadata: Optional[Dict[str, Any]] = None
+    current_price: Optional[Decimal] = None
+    
+    @property
+    def current_value(self) -> Optional[Decimal]:
+        if self.current_price is None:
+            return None
+        return self.quantity * self.current_price
+
+
+class ValuationService:
+    def value_users(self, db: Session, user_ids: List[int]) -> Dict[int, UserValuation]:
+        """Value many users with two set-based queries against latest prices"""
+        valuations = {user_id: UserValuation(user_id=user_id) for user_id in user_ids}
+        if not valuations:
+            return valuations
+        
+        price_join = and_(
+            LatestPrice.symbol == Asset.symbol,
+            LatestPrice.asset_type == Asset.asset_type
+        )
+        
+        # Per-portfolio totals, including portfolios without priced assets
+        portfolio_totals = db.execute(
+            select(
+                Portfolio.user_id,
+                Portfolio.id,
+                Portfolio.name,
+                func.coalesce(func.sum(Asset.quantity * LatestPrice.price), 0)
+            )
+            .select_from(Portfolio)
+            .outerjoin(Asset, Asset.portfolio_id == Portfolio.id)
+            .outerjoin(LatestPrice, price_join)
+            .where(Portfolio.user_id.in_(user_ids))
+            .group_by(Portfolio.user_id, Portfolio.id, Portfolio.name)
+            .order_by(Portfolio.id)
+        ).all()
+        
+        portfolios = {}
+        for user_id, portfolio_id, name, value in portfolio_totals:
+            portfolio = PortfolioValuation(portfolio_id=portfolio_id, name=name, value=Decimal(value))
+            portfolios[portfolio_id] = portfolio
+            valuations[user_id].portfolios.append(portfolio)
+            valuations[user_id].total_value += portfolio.value
+        
+        # Every asset with its latest price, if any, for the breakdowns
+        asset_rows = db.execute(
+            select(
+                Asset.portfolio_id,
+                Asset.id,
+                Asset.symbol,
+                Asset.name,
+                Asset.asset_type,
+                Asset.quantity,
+                Asset.purchase_price_encrypted,
+                Asset.purchase_date,
+                LatestPrice.price
+            )
+            .join(Portfolio, Asset.portfolio_id == Portfolio.id)
+            .outerjoin(LatestPrice, price_join)
+            .where(Portfolio.user_id.in_(user_ids))
+            .order_by(Asset.id)
+        ).all()
+        
+        for row in asset_rows:
+            portfolios[row.portfolio_id].assets.append(AssetValuation(
+                asset_id=row.id,
+                symbol=row.symbol,
+                name=row.name,
+                asset_type=row.asset_type,
+                quantity=row.quantity,
+                purchase_price=self._decrypt_purchase_price(row.id, row.purchase_price_encrypted),
+                purchase_date=row.purchase_date,
+                current_price=row.price,
+                current_value=row.quantity * row.price if row.price is not None else None
+            ))
+        
+        return valuations
+    
+    def iter_user_holdings(self, db: Session, user_id: int, batch_size: int = 500) -> Iterator[HoldingRow]:
+        """Stream a user's holdings in portfolio order from a server-side cursor"""
+        for row in db.execute(self._holdings_query(user_id, batch_size)):
+            yield self._holding_from_row(row)
+    
+    async def stream_user_holdings(self, db: AsyncSession, user_id: int, batch_size: int = 500) -> AsyncIterator[HoldingRow]:
+        """Async variant of iter_user_holdings for request handlers"""
+        result = await db.stream(self._holdings_query(user_id, batch_size))
+        async for row in result:
+            yield self._holding_from_row(row)
+    
+    def _holdings_query(self, user_id: int, batch_size: int):
+        assets = Asset.__table__
+        return (
+            select(
+                Portfolio.id.label('portfolio_id'),
+                Portfolio.name.label('portfolio_name'),
+                Portfolio.description.label('portfolio_description'),
+                Portfolio.created_at.label('portfolio_created_at'),
+                assets.c.id.label('asset_id'),
+                assets.c.symbol,
+                assets.c.name,
+                assets.c.asset_type,
+                assets.c.quantity,
+                assets.c.purchase_price_encrypted,
+                assets.c.purchase_date,
+                assets.c.metadata,
+                LatestPrice.price.label('current_price')
+            )
+            .select_from(Portfolio)
+            .outerjoin(assets, assets.c.portfolio_id == Portfolio.id)
+            .outerjoin(LatestPrice, and_(
+                LatestPrice.symbol == assets.c.symbol,
+                LatestPrice.asset_type == assets.c.asset_type
+            ))
+            .where(Portfolio.user_id == user_id)
+            .order_by(Portfolio.id, assets.c.id)
+            .execution_options(yield_per=batch_size)
+        )
+    
+    def _holding_from_row(self, row) -> HoldingRow:
+        holding = HoldingRow(
+            portfolio_id=row.portfolio_id,
+            portfolio_name=row.portfolio_name,
+            portfolio_description=row.portfolio_description,
+            portfolio_created_at=row.portfolio_created_at
+        )
+        if row.asset_id is not None:
+            holding.asset_id = row.asset_id
+            holding.symbol = row.symbol
+            holding.name = row.name
+            holding.asset_type = row.asset_type
+            holding.quantity = row.quantity
+            holding.purchase_price = self._decrypt_purchase_price(row.asset_id, row.purchase_price_encrypted)
+            holding.purchase_date = row.purchase_date
+            holding.metadata = row.metadata
+            holding.current_price = row.current_price
+        return holding
+    
+    def value_user(self, db: Session, user_id: int) -> UserValuation:
+        """Value a single user; the result serves both snapshots and API responses"""
+        return self.value_users(db, [user_id])[user_id]
+    
+    def _decrypt_purchase_price(self, asset_id: int, purchase_price_encrypted: str) -> Decimal:
+        try:
+            return Decimal(encryption.decrypt(purchase_price_encrypted))
+        except Exception as e:
+            logger.error(f"Error decrypting purchase price for asset {asset_id}: {e}")
+            return Decimal('0')
+    
+    def snapshot_history(
+        self,
+        db: Session,
+        user_id: int,
+        start: datetime,
+        end: datetime,
+        interval: Optional[str] = None,
+        include_breakdown: bool = True
+    ) -> list:
+        """Snapshots between start and end, downsampled to the last one per interval bucket"""
+        columns = [NetWorthSnapshot.timestamp, NetWorthSnapshot.total_value]
+        if include_breakdown:
+            columns.extend([
+                NetWorthSnapshot.id, NetWorthSnapshot.breakdown_snapshot_id, NetWorthSnapshot.portfolio_breakdown
+            ])
+        conditions = [
+            NetWorthSnapshot.user_id == user_id,
+            NetWorthSnapshot.timestamp >= start,
+            NetWorthSnapshot.timestamp <= end
+        ]
+        
+        if interval is None:
+            query = select(*columns).where(*conditions).order_by(NetWorthSnapshot.timestamp, NetWorthSnapshot.id)
+            return self._history_points(db, db.execute(query).all(), include_breakdown)
+        
+        bucket = time_bucket(db, HISTORY_INTERVALS[interval], NetWorthSnapshot.timestamp)
+        ranked = select(
+            *columns,
+            func.row_number().over(
+                partition_by=bucket,
+                order_by=(NetWorthSnapshot.timestamp.desc(), NetWorthSnapshot.id.desc())
+            ).label('bucket_rank')
+        ).where(*conditions).subquery()
+        
+        query = select(
+            *(ranked.c[column.key] for column in columns)
+        ).where(ranked.c.bucket_rank == 1).order_by(ranked.c.timestamp)
+        return self._history_points(db, db.execute(query).all(), include_breakdown)
+    
+    def _history_points(self, db: Session, snapshots: list, include_breakdown: bool) -> List[Dict]:
+        breakdowns = {}
+        if include_breakdown:
+            breakdowns = self.snapshot_breakdowns(db, [
+                snapshot.breakdown_snapshot_id or snapshot.id
+                for snapshot in snapshots
+                if snapshot.portfolio_breakdown is None
+            ])
+        
+        return [
+            {
+                'timestamp': snapshot.timestamp,
+                'total_value': snapshot.total_value,
+                'portfolio_breakdown': (
+                    snapshot.portfolio_breakdown
+                    if snapshot.portfolio_breakdown is not None
+                    else breakdowns.get(snapshot.breakdown_snapshot_id or snapshot.id, {})
+                ) if include_breakdown else None
+            }
+            for snapshot in snapshots
+        ]
+    
+    def snapshot_breakdowns(self, db: Session, snapshot_ids: List[int]) -> Dict[int, Dict]:
+        """Reassemble portfolio breakdowns from snapshot items with one query"""
+        breakdowns = {snapshot_id: {} for snapshot_id in snapshot_ids}
+        if not snapshot_ids:
+            return breakdowns
+        
+        rows = db.execute(
+            select(
+                NetWorthSnapshotItem.snapshot_id,
+                NetWorthSnapshotItem.portfolio_name,
+                NetWorthSnapshotItem.asset_id,
+                NetWorthSnapshotItem.symbol,
+                NetWorthSnapshotItem.quantity,
+                NetWorthSnapshotItem.price,
+                NetWorthSnapshotItem.value
+            ).where(
+                NetWorthSnapshotItem.snapshot_id.in_(set(snapshot_ids))
+            ).order_by(NetWorthSnapshotItem.id)
+        )
+        
+        # Items carry their own names and symbols, so history never reads live portfolios or assets
+        for row in rows:
+            portfolio = breakdowns[row.snapshot_id].setdefault(row.portfolio_name, {'value': 0.0, 'assets': []})
+            if row.asset_id is None:
+                portfolio['value'] = float(row.value)
+            else:
+                portfolio['assets'].append({
+                    'symbol': row.symbol,
+                    'quantity': float(row.quantity),
+                    'current_price': float(row.price),
+                    'current_value': float(row.value)
+                })
+        return breakdowns
+    
+    def write_snapshots(self, db: Session, valuations: List[UserValuation]) -> int:
+        """Insert net worth snapshots and their items for many users, one executemany each"""
+        rows = []
+        items_by_user = {}
+        for valuation in valuations:
+            try:
+                items_by_user[valuation.user_id] = valuation.snapshot_items()
+                rows.append({'user_id': valuation.user_id, 'total_value': valuation.total_value})
+            except Exception as e:
+                logger.error(f"Error computing net worth for user {valuation.user_id}: {e}")
+        
+        if not rows:
+            return 0
+        
+        inserted = db.execute(
+            NetWorthSnapshot.__table__.insert().returning(
+                NetWorthSnapshot.__table__.c.user_id, NetWorthSnapshot.__table__.c.id
+            ),
+            rows
+        )
+        items = [
+            {'snapshot_id': snapshot_id, **item}
+            for user_id, snapshot_id in inserted
+            for item in items_by_user[user_id]
+        ]
+        if items:
+            db.execute(NetWorthSnapshotItem.__table__.insert(), items)
+        db.commit()
+        return len(rows)
+    
+    def init_portfolio_value(self, db: Session, portfolio_id: int, user_id: int) -> None:
+        """Start the stored valuation of a new, empty portfolio; the caller commits"""
+        db.add(PortfolioValue(
+            portfolio_id=portfolio_id,
+            user_id=user_id,
+            asset_count=0,
+            cost_basis=Decimal('0'),
+            current_value=Decimal('0'),
+            gain_loss=Decimal('0'),
+            updated_at=datetime.now(timezone.utc)
+        ))
+    
+    def add_asset_cost(self, db: Session, portfolio_id: int, cost: Decimal) -> None:
+        """Add a new asset's cost to its portfolio's stored valuation; the caller commits"""
+        db.execute(
+            update(PortfolioValue).where(PortfolioValue.portfolio_id == portfolio_id).values(
+                asset_count=PortfolioValue.asset_count + 1,
+                cost_basis=PortfolioValue.cost_basis + cost,
+                gain_loss=PortfolioValue.gain_loss - cost,
+                updated_at=datetime.now(timezone.utc)
+            ),
+            execution_options={'synchronize_session': False}
+        )
+    
+    def remove_portfolio_value(self, db: Session, portfolio_id: int) -> None:
+        """Drop a deleted portfolio's stored valuation; the caller commits"""
+        db.execute(
+            delete(PortfolioValue).where(PortfolioValue.portfolio_id == portfolio_id),
+            execution_options={'synchronize_session': False}
+        )
+    
+    def refresh_portfolio_values(self, db: Session, portfolio_ids: Iterable[int]) -> None:
+        """Recompute stored current values from latest prices; the caller commits"""
+        portfolio_ids = list(set(portfolio_ids))
+        if not portfolio_ids:
+            return
+        
+        values = dict(db.execute(
+            select(
+                Asset.portfolio_id,
+                func.sum(Asset.quantity * LatestPrice.price)
+            ).join(
+                LatestPrice,
+                and_(LatestPrice.symbol == Asset.symbol, LatestPrice.asset_type == Asset.asset_type)
+            ).where(
+                Asset.portfolio_id.in_(portfolio_ids)
+            ).group_by(Asset.portfolio_id)
+        ).all())
+        
+        table = PortfolioValue.__table__
+        db.execute(
+            update(table).where(table.c.portfolio_id == bindparam('id')).values(
+                current_value=bindparam('value'),
+                gain_loss=bindparam('value') - table.c.cost_basis,
+                updated_at=bindparam('now')
+            ),
+            [
+                {'id': portfolio_id, 'value': values.get(portfolio_id) or Decimal('0'), 'now': datetime.now(timezone.utc)}
+                for portfolio_id in portfolio_ids
+            ],
+            execution_options={'synchronize_session': False}
+        )
+    
+    def refresh_holder_values(self, db: Session, keys: Iterable[Tuple[str, str]]) -> None:
+        """Recompute stored values of every portfolio holding one of the pairs; the caller commits"""
+        keys = list(set(keys))
+        if not keys:
+            return
+        
+        portfolio_ids = db.execute(
+            select(SymbolHolder.portfolio_id).where(
+                tuple_(SymbolHolder.symbol, SymbolHolder.asset_type).in_(keys)
+            ).distinct()
+        ).scalars().all()
+        self.refresh_portfolio_values(db, portfolio_ids)
+    
+    def store_portfolio_values(self, db: Session, valuations: List[UserValuation]) -> None:
+        """Rewrite stored portfolio valuations from full valuations, correcting any drift"""
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                'portfolio_id': portfolio.portfolio_id,
+                'user_id': valuation.user_id,
+                'asset_count': len(portfolio.assets),
+                'cost_basis': portfolio.cost_basis,
+                'current_value': portfolio.value,
+                'gain_loss': portfolio.value - portfolio.cost_basis,
+                'updated_at': now
+            }
+            for valuation in valuations
+            for portfolio in valuation.portfolios
+        ]
+        if not rows:
+            return
+        
+        insert = pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+        stmt = insert(PortfolioValue)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PortfolioValue.portfolio_id],
+            set_={
+                'asset_count': stmt.excluded.asset_count,
+                'cost_basis': stmt.excluded.cost_basis,
+                'current_value': stmt.excluded.current_value,
+                'gain_loss': stmt.excluded.gain_loss,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.execute(stmt, rows)
+        db.commit()
+    
+    def get_portfolio_values(self, db: Session, user_id: int) -> list:
+        """A user's stored portfolio valuations with portfolio names, in one indexed read"""
+        return db.execute(
+            select(
+                PortfolioValue.portfolio_id,
+                Portfolio.name,
+                PortfolioValue.asset_count,
+                PortfolioValue.cost_basis,
+                PortfolioValue.current_value,
+                PortfolioValue.gain_loss,
+                PortfolioValue.updated_at
+            ).join(
+                Portfolio, Portfolio.id == PortfolioValue.portfolio_id
+            ).where(
+                PortfolioValue.user_id == user_id
+            ).order_by(PortfolioValue.portfolio_id)
+        ).all()
+    
+    def mark_users_dirty(self, db: Session, user_ids: Iterable[int]) -> None:
+        """Flag users for revaluation on the next run; the caller commits"""
+        marked_at = datetime.now(timezone.utc)
+        rows = [{'user_id': user_id, 'marked_at': marked_at} for user_id in set(user_ids)]
+        if rows:
+            db.execute(self._remark_on_conflict(self._dirty_insert(db)), rows)
+    
+    def mark_holders_dirty(self, db: Session, keys: Iterable[Tuple[str, str]]) -> None:
+        """Flag every user holding one of the (symbol, asset_type) pairs; the caller commits"""
+        # Holders read from the in-memory index; a holding newer than it already flagged its own user
+        from services.holder_index_service import holder_index_service
+        self.mark_users_dirty(db, holder_index_service.get_holder_user_ids(db, keys))
+    
+    def _dirty_insert(self, db: Session):
+        insert = pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+        return insert(ValuationDirtyUser)
+    
+    def _remark_on_conflict(self, stmt):
+        # Re-marking moves marked_at forward so a change made during a run is kept for the next one
+        return stmt.on_conflict_do_update(
+            index_elements=[ValuationDirtyUser.user_id],
+            set_={'marked_at': stmt.excluded.marked_at}
+        )
+    
+    def needs_valuation(self, cutoff: datetime):
+        """Users flagged before cutoff, or never valued at all"""
+        return or_(
+            exists().where(and_(
+                ValuationDirtyUser.user_id == User.id,
+                ValuationDirtyUser.marked_at <= cutoff
+            )),
+            ~exists().where(NetWorthSnapshot.user_id == User.id)
+        )
+    
+    def carry_forward_snapshots(self, db: Session, cutoff: datetime) -> int:
+        """Copy the latest snapshot of every unchanged user to a new row stamped cutoff.
+        
+        The copy points at the original's items instead of duplicating them.
+        """
+        # One backward probe of the (user_id, timestamp) index per user, rather than
+        # aggregating over every snapshot in every partition
+        latest = aliased(NetWorthSnapshot)
+        latest_id = select(latest.id).where(
+            latest.user_id == User.id
+        ).order_by(
+            latest.timestamp.desc(), latest.id.desc()
+        ).limit(1).correlate(User).scalar_subquery()
+        
+        unchanged = select(
+            NetWorthSnapshot.user_id,
+            NetWorthSnapshot.total_value,
+            NetWorthSnapshot.portfolio_breakdown,
+            func.coalesce(NetWorthSnapshot.breakdown_snapshot_id, NetWorthSnapshot.id),
+            literal(cutoff, DateTime(timezone=True))
+        ).select_from(User).join(
+            NetWorthSnapshot, and_(NetWorthSnapshot.user_id == User.id, NetWorthSnapshot.id == latest_id)
+        ).where(
+            ~exists().where(and_(
+                ValuationDirtyUser.user_id == User.id,
+                ValuationDirtyUser.marked_at <= cutoff
+            ))
+        )
+        
+        result = db.execute(NetWorthSnapshot.__table__.insert().from_select(
+            ['user_id', 'total_value', 'portfolio_breakdown', 'breakdown_snapshot_id', 'timestamp'], unchanged
+        ))
+        db.commit()
+        return result.rowcount
+    
+    def clear_dirty_users(self, db: Session, cutoff: datetime) -> None:
+        """Drop flags handled by a run; users re-marked after cutoff stay flagged"""
+        db.execute(delete(ValuationDirtyUser).where(ValuationDirtyUser.marked_at <= cutoff))
+        db.commit()
+    
+    def compute_all_user_valuations(self, db: Session, batch_size: int = 1000) -> int:
+        """Revalue changed users in id-ordered batches and carry the rest forward"""
+        started = time.perf_counter()
+        cutoff = datetime.now(timezone.utc)
+        carried = self.carry_forward_snapshots(db, cutoff)
+        stored = self.compute_user_range(db, 0, None, batch_size, cutoff)
+        self.clear_dirty_users(db, cutoff)
+        logger.info(
+            f"Stored {stored} net worth snapshots and carried {carried} forward "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return stored
+    
+    def compute_user_range(
+        self, db: Session, start_id: int, end_id: Optional[int], batch_size: int = 1000, cutoff: Optional[datetime] = None
+    ) -> int:
+        """Value users with start_id <= id < end_id (unbounded when end_id is None).
+        
+        With a cutoff, only users needing valuation as of cutoff are valued.
+        """
+        stored = 0
+        last_user_id = start_id - 1
+        
+        while True:
+            query = select(User.id).where(User.id > last_user_id)
+            if end_id is not None:
+                query = query.where(User.id < end_id)
+            if cutoff is not None:
+                query = query.where(self.needs_valuation(cutoff))
+            user_ids = db.execute(query.order_by(User.id).limit(batch_size)).scalars().all()
+            if not user_ids:
+                break
+            
+            valuations = self.value_users(db, user_ids)
+            self.store_portfolio_values(db, list(valuations.values()))
+            stored += self.write_snapshots(db, list(valuations.values()))
+            last_user_id = user_ids[-1]
+        
+        return stored
+    
+    def user_id_shards(self, db: Session, shard_size: int) -> List[Tuple[int, int]]:
+        """Split the user id space into [start, end) ranges of shard_size ids"""
+        min_id, max_id = db.execute(select(func.min(User.id), func.max(User.id))).one()
+        if min_id is None:
+            return []
+        return [
+            (start_id, min(start_id + shard_size, max_id + 1))
+            for start_id in range(min_id, max_id + 1, shard_size)
+        ]
+
+
+# Session factory bound to the current valuation worker's engine, set by init_valuation_worker
+_worker_sessions = None
+
+
+def init_valuation_worker() -> None:
+    """Process pool initializer: one engine per worker process, reused by every shard it values"""
+    global _worker_sessions
+    engine = create_engine(settings.database_url)
+    _worker_sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def value_user_shard(start_id: int, end_id: int, cutoff: Optional[datetime] = None) -> Tuple[int, float]:
+    """Process pool entry point: value one id range with the worker's engine"""
+    started = time.perf_counter()
+    if _worker_sessions is None:
+        init_valuation_worker()
+    db = _worker_sessions()
+    try:
+        stored = valuation_service.compute_user_range(db, start_id, end_id, settings.valuation_batch_size, cutoff)
+    finally:
+        db.close()
+    return stored, time.perf_counter() - started
+
+
+valuation_service = ValuationService()
@@ -1,10 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from main import app
-from database import get_db, Base
+from database import get_db, get_async_db, Base
 from config import settings
+from services.price_service import price_service
+from services.holder_index_service import holder_index_service
 import tempfile
 import os
 
@@ -16,6 +20,10 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Each TestClient runs its own event loop, so async connections are never pooled across tests
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     try:
@@ -25,12 +33,20 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 @pytest.fixture
 def client():
     Base.metadata.create_all(bind=engine)
+    price_service.latest_price_cache.clear()
+    holder_index_service.invalidate()
     with TestClient(app) as c:
         yield c
     Base.metadata.drop_all(bind=engine)
@@ -63,3 +79,29 @@ def authenticated_client(client, test_user):
     client.headers.update({"Authorization": f"Bearer {token}"})
     
     return client
+
+
+@pytest.fixture
+def db_session(client):
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def query_counter():
+    """Collect SQL statements executed against the test database"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    # Async request handlers run on the async engine's underlying sync engine
+    engines = [engine, async_engine.sync_engine]
+    for counted_engine in engines:
+        event.listen(counted_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    for counted_engine in engines:
+        event.remove(counted_engine, "before_cursor_execute", before_cursor_execute)
@@ -72,3 +72,24 @@ def test_login_nonexistent_user(client):
     }
     response = client.post("/auth/login", json=login_data)
     assert response.status_code == 401
+
+
+def test_sync_routes_authenticate_on_their_own_session(authenticated_client):
+    """Test sync routes resolve the current user without opening an async connection"""
+    from sqlalchemy import event
+    from tests.conftest import async_engine
+    
+    portfolio_id = authenticated_client.post("/portfolios/", json={"name": "Stocks"}).json()["id"]
+    connections = []
+    
+    def connect(dbapi_connection, connection_record):
+        connections.append(dbapi_connection)
+    
+    event.listen(async_engine.sync_engine, "connect", connect)
+    try:
+        assert authenticated_client.get(f"/portfolios/{portfolio_id}").status_code == 200
+        assert connections == []
+        assert authenticated_client.get("/portfolios/").status_code == 200
+        assert len(connections) == 1
+    finally:
+        event.remove(async_engine.sync_engine, "connect", connect)
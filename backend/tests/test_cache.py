@@ -0,0 +1,61 @@
+from utils.cache import TTLCache, MISSING
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_cache_evicts_least_recently_used():
+    """Test the cache stays bounded by evicting the oldest entry"""
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    
+    cache.set("c", 3)
+    
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cache_entries_expire():
+    """Test entries are dropped once their TTL has passed"""
+    timer = FakeTimer()
+    cache = TTLCache(max_size=10, ttl_seconds=60, timer=timer)
+    cache.set("a", None)
+    
+    assert cache.get("a") is None
+    timer.now = 61
+    assert cache.get("a") is MISSING
+
+
+def test_cache_stats_count_hits_and_misses():
+    """Test hit/miss counters used to size the cache"""
+    cache = TTLCache(max_size=10)
+    cache.get("a")
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_cache_rejects_values_loaded_before_invalidation():
+    """Test a value read before an invalidation is not cached after it"""
+    cache = TTLCache(max_size=10)
+    generation = cache.generation("a")
+    cache.invalidate("a")
+    
+    cache.set("a", "stale", generation=generation)
+    assert cache.get("a") is MISSING
+    
+    cache.set("a", "fresh", generation=cache.generation("a"))
+    assert cache.get("a") == "fresh"
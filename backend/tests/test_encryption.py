@@ -0,0 +1,68 @@
+from utils.encryption import AESEncryption
+
+
+def test_decrypt_round_trip():
+    """Test encrypted purchase prices decrypt to the original value"""
+    encryption = AESEncryption()
+    
+    assert encryption.decrypt(encryption.encrypt("150.25")) == "150.25"
+
+
+def test_repeat_decrypts_are_served_from_cache():
+    """Test decrypting the same ciphertext twice skips the crypto work"""
+    encryption = AESEncryption()
+    ciphertext = encryption.encrypt("150.25")
+    encryption.clear_cache()
+    
+    encryption.decrypt(ciphertext)
+    encryption.decrypt(ciphertext)
+    
+    stats = encryption.decrypt_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    
+    encryption.clear_cache()
+    assert encryption.decrypt_cache.stats()["size"] == 0
+
+
+def test_legacy_ciphertexts_still_decrypt():
+    """Test values written in the old base64-wrapped format remain readable"""
+    import base64
+    encryption = AESEncryption()
+    legacy = base64.b64encode(encryption.cipher.encrypt(b"99.5")).decode()
+    
+    assert encryption.needs_reencryption(legacy)
+    assert encryption.decrypt(legacy) == "99.5"
+    
+    compact = encryption.encrypt("99.5")
+    assert not encryption.needs_reencryption(compact)
+    assert len(compact) < len(legacy)
+
+
+def test_reencrypt_legacy_purchase_prices(authenticated_client, db_session):
+    """Test the background migration rewrites legacy rows in the compact format"""
+    import base64
+    from models import Asset
+    from services.portfolio_service import portfolio_service
+    from utils.encryption import encryption
+    
+    portfolio_id = authenticated_client.post("/portfolios/", json={"name": "Legacy"}).json()["id"]
+    authenticated_client.post(f"/portfolios/{portfolio_id}/assets", json={
+        "symbol": "AAPL",
+        "name": "Apple Inc.",
+        "asset_type": "stock",
+        "quantity": "1",
+        "purchase_price": "150.25",
+        "purchase_date": "2024-01-15T10:30:00"
+    })
+    asset = db_session.query(Asset).one()
+    asset.purchase_price_encrypted = base64.b64encode(encryption.cipher.encrypt(b"150.25")).decode()
+    db_session.commit()
+    
+    last_id, rewritten = portfolio_service.reencrypt_legacy_purchase_prices(db_session)
+    assert rewritten == 1
+    assert portfolio_service.reencrypt_legacy_purchase_prices(db_session, last_id) == (None, 0)
+    
+    db_session.refresh(asset)
+    assert not encryption.needs_reencryption(asset.purchase_price_encrypted)
+    assert encryption.decrypt(asset.purchase_price_encrypted) == "150.25"
@@ -0,0 +1,250 @@
+import pytest
+import csv
+import io
+import json
+from decimal import Decimal
+from services.price_service import price_service
+
+
+@pytest.fixture
+def portfolio_with_assets(authenticated_client, db_session):
+    portfolio_id = authenticated_client.post("/portfolios/", json={"name": "Export"}).json()["id"]
+    for symbol, quantity, purchase_price in [("AAPL", "10", "150"), ("XYZ", "2", "5")]:
+        response = authenticated_client.post(f"/portfolios/{portfolio_id}/assets", json={
+            "symbol": symbol,
+            "name": f"{symbol} Inc.",
+            "asset_type": "stock",
+            "quantity": quantity,
+            "purchase_price": purchase_price,
+            "purchase_date": "2024-01-15T10:30:00"
+        })
+        assert response.status_code == 200
+    authenticated_client.post("/portfolios/", json={"name": "Empty"})
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'}
+    ])
+    return portfolio_id
+
+
+def test_export_csv_streams_rows(authenticated_client, portfolio_with_assets):
+    """Test the CSV export contains a row per asset"""
+    response = authenticated_client.get("/export/csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "Portfolio Name"
+    assert rows[1] == ["Export", "AAPL", "AAPL Inc.", "stock", "10.0", "150.0", "2024-01-15", "200.0", "2000.0", "500.00", "33.33%"]
+    assert rows[2][7:] == ["N/A", "N/A", "N/A", "N/A"]
+    assert len(rows) == 3
+
+
+def test_export_failure_while_streaming_is_logged(authenticated_client, portfolio_with_assets, monkeypatch, caplog):
+    """Test an error raised after the response has started is logged and aborts the transfer"""
+    from routers import export
+    
+    def failing_row(holding):
+        raise ValueError("bad holding")
+    
+    monkeypatch.setattr(export, "csv_row", failing_row)
+    
+    with pytest.raises(ValueError):
+        authenticated_client.get("/export/csv")
+    assert "Error exporting CSV for user" in caplog.text
+
+
+def test_csv_chunks_are_bounded(monkeypatch):
+    """Test the CSV generator flushes in chunks rather than building one string"""
+    from datetime import datetime
+    from routers import export
+    from services.valuation_service import HoldingRow
+    
+    monkeypatch.setattr(export, "CSV_CHUNK_SIZE", 1024)
+    holdings = (
+        HoldingRow(
+            portfolio_id=1, portfolio_name="Big", portfolio_description=None, portfolio_created_at=datetime(2024, 1, 1),
+            asset_id=i, symbol=f"SYM{i}", name=f"Asset {i}", asset_type="stock", quantity=Decimal("1"),
+            purchase_price=Decimal("10"), purchase_date=datetime(2024, 1, 1), current_price=Decimal("11")
+        )
+        for i in range(1000)
+    )
+    
+    chunks = list(export.iter_csv(holdings))
+    
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks) < 2048
+    assert b"".join(chunks).count(b"\r\n") == 1001
+
+
+def test_export_json_structure(authenticated_client, portfolio_with_assets):
+    """Test the streamed JSON export parses with per-portfolio summaries"""
+    response = authenticated_client.get("/export/json")
+    assert response.status_code == 200
+    
+    data = json.loads(response.content)
+    assert data["user"]["email"] == "test@example.com"
+    assert [p["name"] for p in data["portfolios"]] == ["Export", "Empty"]
+    
+    export_portfolio = data["portfolios"][0]
+    assert [a["symbol"] for a in export_portfolio["assets"]] == ["AAPL", "XYZ"]
+    assert export_portfolio["assets"][0]["gain_loss"] == 500.0
+    assert export_portfolio["assets"][1]["current_value"] is None
+    assert export_portfolio["summary"]["total_assets"] == 2
+    assert export_portfolio["summary"]["purchase_value"] == 1510.0
+    assert export_portfolio["summary"]["current_value"] == 2000.0
+    
+    assert data["portfolios"][1]["assets"] == []
+    assert data["portfolios"][1]["summary"]["total_assets"] == 0
+    assert data["summary"]["total_portfolios"] == 2
+    assert data["summary"]["total_gain_loss"] == 490.0
+
+
+def test_export_ndjson_one_asset_per_line(authenticated_client, portfolio_with_assets):
+    """Test the NDJSON export emits one asset object per line"""
+    response = authenticated_client.get("/export/ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["symbol"] for line in lines] == ["AAPL", "XYZ"]
+    assert all(line["portfolio_id"] == portfolio_with_assets for line in lines)
+    assert lines[0]["portfolio_name"] == "Export"
+
+
+def test_export_parquet_typed_columns(authenticated_client, portfolio_with_assets):
+    """Test the Parquet export carries typed decimal and timestamp columns"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    response = authenticated_client.get("/export/parquet")
+    assert response.status_code == 200
+    
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 2
+    assert table.schema.field("quantity").type == pa.decimal128(20, 8)
+    assert pa.types.is_timestamp(table.schema.field("purchase_date").type)
+    
+    rows = table.to_pylist()
+    assert rows[0]["symbol"] == "AAPL"
+    assert rows[0]["current_value"] == Decimal("2000")
+    assert rows[0]["gain_loss"] == Decimal("500")
+    assert rows[1]["current_price"] is None
+
+
+def test_export_arrow_stream_batches(authenticated_client, portfolio_with_assets, monkeypatch):
+    """Test the Arrow IPC export writes one record batch per batch of rows"""
+    import pyarrow as pa
+    from routers import export
+    
+    monkeypatch.setattr(export, "COLUMNAR_BATCH_SIZE", 1)
+    response = authenticated_client.get("/export/arrow")
+    assert response.status_code == 200
+    
+    reader = pa.ipc.open_stream(response.content)
+    batches = list(reader)
+    assert len(batches) == 2
+    assert pa.Table.from_batches(batches).column("symbol").to_pylist() == ["AAPL", "XYZ"]
+
+
+@pytest.fixture
+def export_jobs(monkeypatch, tmp_path):
+    from services.export_service import export_service
+    from tests.conftest import TestingSessionLocal
+    
+    monkeypatch.setattr(export_service, "export_dir", tmp_path)
+    monkeypatch.setattr(export_service, "session_factory", TestingSessionLocal)
+    return export_service
+
+
+def test_export_job_produces_download(authenticated_client, portfolio_with_assets, export_jobs):
+    """Test a background export job completes and its artifact downloads"""
+    response = authenticated_client.post("/export/jobs", json={"format": "csv"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    
+    job = authenticated_client.get(f"/export/jobs/{job_id}").json()
+    assert job["status"] == "completed"
+    assert job["cached"] is False
+    
+    download = authenticated_client.get(job["download_url"])
+    assert download.status_code == 200
+    assert download.text == authenticated_client.get("/export/csv").text
+
+
+def test_export_job_reuses_artifact_until_data_changes(authenticated_client, portfolio_with_assets, export_jobs, db_session, monkeypatch):
+    """Test a repeat export is served from cache until prices change"""
+    first = authenticated_client.post("/export/jobs", json={"format": "parquet"}).json()
+    
+    rendered = []
+    original_run_job = export_jobs.run_job
+    monkeypatch.setattr(export_jobs, "run_job", lambda *args: rendered.append(args) or original_run_job(*args))
+    
+    second = authenticated_client.post("/export/jobs", json={"format": "parquet"}).json()
+    assert second["status"] == "completed"
+    assert second["cached"] is True
+    assert rendered == []
+    
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'XYZ', 'asset_type': 'stock', 'price': Decimal("6"), 'source': 'alpha_vantage'}
+    ])
+    third = authenticated_client.post("/export/jobs", json={"format": "parquet"}).json()
+    assert third["status"] == "pending"
+    assert len(rendered) == 1
+    assert authenticated_client.get(f"/export/jobs/{third['id']}").json()["cached"] is False
+    assert len(list(export_jobs.export_dir.iterdir())) == 1
+    assert first["id"] != third["id"]
+
+
+def test_export_job_rejects_unknown_format_and_other_users(authenticated_client, export_jobs):
+    """Test unsupported formats are rejected and jobs are private to their owner"""
+    assert authenticated_client.post("/export/jobs", json={"format": "xlsx"}).status_code == 400
+    assert authenticated_client.get("/export/jobs/does-not-exist").status_code == 404
+    
+    job_id = authenticated_client.post("/export/jobs", json={"format": "csv"}).json()["id"]
+    other_user = {"email": "other@example.com", "password": "otherpassword123", "full_name": "Other User"}
+    assert authenticated_client.post("/auth/signup", json=other_user).status_code == 200
+    token = authenticated_client.post("/auth/login", json={
+        "email": other_user["email"], "password": other_user["password"]
+    }).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+    
+    assert authenticated_client.get(f"/export/jobs/{job_id}", headers=other_headers).status_code == 404
+    assert authenticated_client.get(f"/export/jobs/{job_id}/download", headers=other_headers).status_code == 404
+    assert authenticated_client.get(f"/export/jobs/{job_id}/download").status_code == 200
+
+
+def test_export_job_state_is_shared_across_service_instances(authenticated_client, portfolio_with_assets, export_jobs):
+    """Test job state lives in the database, so any worker or a restarted one can serve it"""
+    from services.export_service import ExportService
+    from models import User
+    from tests.conftest import TestingSessionLocal
+    
+    job_id = authenticated_client.post("/export/jobs", json={"format": "csv"}).json()["id"]
+    
+    db = TestingSessionLocal()
+    try:
+        user_id = db.query(User).one().id
+        job = ExportService(str(export_jobs.export_dir)).get_job(db, job_id, user_id)
+        assert job.status == "completed"
+        assert job.path.startswith(str(export_jobs.export_dir))
+    finally:
+        db.close()
+
+
+def test_export_job_json_tracks_profile_changes(authenticated_client, portfolio_with_assets, export_jobs, db_session):
+    """Test cached JSON artifacts carry no export timestamp and are re-rendered when the profile changes"""
+    from models import User
+    
+    first = authenticated_client.post("/export/jobs", json={"format": "json"}).json()
+    payload = json.loads(authenticated_client.get(f"/export/jobs/{first['id']}/download").content)
+    assert "export_timestamp" not in payload
+    assert payload["user"]["full_name"] == "Test User"
+    
+    user = db_session.query(User).one()
+    user.full_name = "Renamed User"
+    db_session.commit()
+    
+    second = authenticated_client.post("/export/jobs", json={"format": "json"}).json()
+    assert second["status"] == "pending"
+    payload = json.loads(authenticated_client.get(f"/export/jobs/{second['id']}/download").content)
+    assert payload["user"]["full_name"] == "Renamed User"
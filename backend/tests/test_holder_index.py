@@ -0,0 +1,88 @@
+from models import SymbolHolder, User
+from services.holder_index_service import holder_index_service
+
+
+def add_asset(client, portfolio_id, symbol, asset_type="stock"):
+    response = client.post(f"/portfolios/{portfolio_id}/assets", json={
+        "symbol": symbol,
+        "name": symbol,
+        "asset_type": asset_type,
+        "quantity": "1",
+        "purchase_price": "10",
+        "purchase_date": "2024-01-15T10:30:00"
+    })
+    assert response.status_code == 200
+
+
+def test_holder_index_tracks_created_assets(authenticated_client, db_session, query_counter):
+    """Test committed holdings reach the table and the loaded index without a reload"""
+    user_id = db_session.query(User).one().id
+    stocks = authenticated_client.post("/portfolios/", json={"name": "Stocks"}).json()["id"]
+    mixed = authenticated_client.post("/portfolios/", json={"name": "Mixed"}).json()["id"]
+    assert holder_index_service.get_held_keys(db_session) == []
+    add_asset(authenticated_client, stocks, "aapl")
+    add_asset(authenticated_client, stocks, "AAPL")
+    add_asset(authenticated_client, mixed, "AAPL")
+    add_asset(authenticated_client, mixed, "BTC", "crypto")
+    
+    holders = db_session.query(
+        SymbolHolder.symbol, SymbolHolder.asset_type, SymbolHolder.portfolio_id, SymbolHolder.user_id
+    ).order_by(SymbolHolder.symbol, SymbolHolder.portfolio_id).all()
+    assert [tuple(row) for row in holders] == [
+        ("AAPL", "stock", stocks, user_id),
+        ("AAPL", "stock", mixed, user_id),
+        ("BTC", "crypto", mixed, user_id)
+    ]
+    
+    query_counter.clear()
+    assert sorted(holder_index_service.get_held_keys(db_session)) == [("AAPL", "stock"), ("BTC", "crypto")]
+    assert holder_index_service.get_holders(db_session, [("AAPL", "stock"), ("ETH", "crypto")]) == {
+        ("AAPL", "stock"): {stocks: user_id, mixed: user_id}
+    }
+    assert holder_index_service.get_holder_user_ids(db_session, [("BTC", "crypto")]) == {user_id}
+    assert query_counter == []
+
+
+def test_holder_index_ignores_rolled_back_holdings(authenticated_client, db_session):
+    """Test a holding whose transaction rolls back never appears in the index"""
+    stocks = authenticated_client.post("/portfolios/", json={"name": "Stocks"}).json()["id"]
+    add_asset(authenticated_client, stocks, "AAPL")
+    user_id = db_session.query(User).one().id
+    assert holder_index_service.get_held_keys(db_session) == [("AAPL", "stock")]
+    
+    holder_index_service.add_holding(db_session, "MSFT", "stock", stocks, user_id)
+    db_session.rollback()
+    
+    assert holder_index_service.get_held_keys(db_session) == [("AAPL", "stock")]
+    assert holder_index_service.get_holder_user_ids(db_session, [("MSFT", "stock")]) == set()
+
+
+def test_holder_index_drops_deleted_portfolios(authenticated_client, db_session):
+    """Test deleting a portfolio removes it from the loaded index"""
+    stocks = authenticated_client.post("/portfolios/", json={"name": "Stocks"}).json()["id"]
+    crypto = authenticated_client.post("/portfolios/", json={"name": "Crypto"}).json()["id"]
+    add_asset(authenticated_client, stocks, "AAPL")
+    add_asset(authenticated_client, crypto, "BTC", "crypto")
+    add_asset(authenticated_client, crypto, "AAPL")
+    holder_index_service.get_held_keys(db_session)
+    
+    assert authenticated_client.delete(f"/portfolios/{crypto}").status_code == 200
+    
+    assert holder_index_service.get_held_keys(db_session) == [("AAPL", "stock")]
+    assert list(holder_index_service.get_holders(db_session, [("AAPL", "stock")])[("AAPL", "stock")]) == [stocks]
+    assert db_session.query(SymbolHolder).filter(SymbolHolder.portfolio_id == crypto).count() == 0
+
+
+def test_holder_index_reloads_after_refresh_interval(authenticated_client, db_session):
+    """Test holdings written by another process appear once the index is due for a reload"""
+    stocks = authenticated_client.post("/portfolios/", json={"name": "Stocks"}).json()["id"]
+    user_id = db_session.query(User).one().id
+    assert holder_index_service.get_held_keys(db_session) == []
+    
+    # Written straight to the table, as another worker's committed holding would be
+    db_session.add(SymbolHolder(symbol="AAPL", asset_type="stock", portfolio_id=stocks, user_id=user_id))
+    db_session.commit()
+    assert holder_index_service.get_held_keys(db_session) == []
+    
+    holder_index_service.loaded_at -= holder_index_service.refresh_seconds
+    assert holder_index_service.get_held_keys(db_session) == [("AAPL", "stock")]
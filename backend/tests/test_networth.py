@@ -0,0 +1,327 @@
+import importlib
+import pytest
+from decimal import Decimal
+from models import User, NetWorthSnapshot, NetWorthSnapshotItem
+from services.price_service import price_service
+from services.valuation_service import valuation_service
+
+
+def create_portfolio_with_assets(client, name, assets):
+    portfolio_id = client.post("/portfolios/", json={"name": name}).json()["id"]
+    for symbol, asset_type, quantity, purchase_price in assets:
+        asset_data = {
+            "symbol": symbol,
+            "name": symbol,
+            "asset_type": asset_type,
+            "quantity": quantity,
+            "purchase_price": purchase_price,
+            "purchase_date": "2024-01-15T10:30:00"
+        }
+        response = client.post(f"/portfolios/{portfolio_id}/assets", json=asset_data)
+        assert response.status_code == 200
+    return portfolio_id
+
+
+def test_compute_all_user_valuations_stores_snapshots(authenticated_client, db_session):
+    """Test the set-based nightly valuation totals and breakdown"""
+    create_portfolio_with_assets(authenticated_client, "Stocks", [
+        ("AAPL", "stock", "10", "150"),
+        ("MSFT", "stock", "5", "300"),
+    ])
+    create_portfolio_with_assets(authenticated_client, "Crypto", [("BTC", "crypto", "0.5", "40000")])
+    create_portfolio_with_assets(authenticated_client, "Empty", [])
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'},
+        {'symbol': 'BTC', 'asset_type': 'crypto', 'price': Decimal("50000"), 'source': 'coingecko'},
+    ])
+    
+    assert valuation_service.compute_all_user_valuations(db_session) == 1
+    
+    snapshot = db_session.query(NetWorthSnapshot).one()
+    assert snapshot.total_value == Decimal("27000")
+    assert snapshot.portfolio_breakdown is None
+    # Portfolio totals plus the two priced assets
+    assert db_session.query(NetWorthSnapshotItem).filter(NetWorthSnapshotItem.snapshot_id == snapshot.id).count() == 5
+    
+    breakdown = valuation_service.snapshot_breakdowns(db_session, [snapshot.id])[snapshot.id]
+    assert breakdown["Stocks"]["value"] == 2000.0
+    assert breakdown["Stocks"]["assets"] == [{
+        'symbol': 'AAPL',
+        'quantity': 10.0,
+        'current_price': 200.0,
+        'current_value': 2000.0
+    }]
+    assert breakdown["Crypto"]["value"] == 25000.0
+    assert breakdown["Empty"] == {'value': 0.0, 'assets': []}
+
+
+def test_compute_all_user_valuations_query_count_is_constant(authenticated_client, db_session, query_counter):
+    """Test the nightly valuation does not issue per-user queries"""
+    create_portfolio_with_assets(authenticated_client, "Stocks", [("AAPL", "stock", "1", "100")])
+    db_session.add_all([
+        User(email=f"user{i}@example.com", hashed_password="x") for i in range(25)
+    ])
+    db_session.commit()
+    
+    query_counter.clear()
+    assert valuation_service.compute_all_user_valuations(db_session, batch_size=100) == 26
+    
+    # carry-forward insert, user ids, portfolio totals, priced assets, portfolio valuation upsert,
+    # snapshot insert, item insert, final empty user batch, dirty flag cleanup
+    assert len(query_counter) == 9
+    assert db_session.query(NetWorthSnapshot).count() == 26
+
+
+def test_nightly_valuation_only_revalues_changed_users(authenticated_client, db_session):
+    """Test unchanged users are carried forward and price or holding changes trigger revaluation"""
+    create_portfolio_with_assets(authenticated_client, "Stocks", [("AAPL", "stock", "10", "150")])
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'}
+    ])
+    db_session.add(User(email="idle@example.com", hashed_password="x"))
+    db_session.commit()
+    
+    assert valuation_service.compute_all_user_valuations(db_session) == 2
+    assert valuation_service.compute_all_user_valuations(db_session) == 0
+    assert db_session.query(NetWorthSnapshot).count() == 4
+    
+    # An unchanged price does not dirty its holders; a moved one does
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'}
+    ])
+    assert valuation_service.compute_all_user_valuations(db_session) == 0
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("210"), 'source': 'alpha_vantage'}
+    ])
+    assert valuation_service.compute_all_user_valuations(db_session) == 1
+    
+    create_portfolio_with_assets(authenticated_client, "More", [("MSFT", "stock", "1", "300")])
+    assert valuation_service.compute_all_user_valuations(db_session) == 1
+    
+    totals = [
+        snapshot.total_value
+        for snapshot in db_session.query(NetWorthSnapshot).join(User).filter(
+            User.email == "test@example.com"
+        ).order_by(NetWorthSnapshot.id)
+    ]
+    assert totals == [Decimal("2000"), Decimal("2000"), Decimal("2000"), Decimal("2100"), Decimal("2100")]
+    assert db_session.query(NetWorthSnapshot).count() == 10
+
+
+def test_user_id_shards_partition_users(client, db_session):
+    """Test shards cover every user exactly once"""
+    db_session.add_all([
+        User(email=f"user{i}@example.com", hashed_password="x") for i in range(25)
+    ])
+    db_session.commit()
+    
+    shards = valuation_service.user_id_shards(db_session, shard_size=10)
+    stored = sum(
+        valuation_service.compute_user_range(db_session, start_id, end_id, batch_size=4)
+        for start_id, end_id in shards
+    )
+    
+    assert len(shards) == 3
+    assert stored == 25
+    assert db_session.query(NetWorthSnapshot).count() == 25
+
+
+def test_valuation_worker_reuses_its_engine_across_shards(monkeypatch):
+    """Test a worker process values every shard through the engine its initializer opened"""
+    # The services package re-exports the singleton under the module's name
+    valuation_module = importlib.import_module("services.valuation_service")
+    
+    binds = []
+    monkeypatch.setattr(valuation_module, "_worker_sessions", None)
+    monkeypatch.setattr(
+        valuation_service, "compute_user_range",
+        lambda db, start_id, end_id, batch_size, cutoff: binds.append(db.get_bind()) or end_id - start_id
+    )
+    valuation_module.init_valuation_worker()
+    
+    assert valuation_module.value_user_shard(1, 11)[0] == 10
+    assert valuation_module.value_user_shard(11, 21)[0] == 10
+    assert binds[0] is binds[1]
+
+
+@pytest.mark.asyncio
+async def test_compute_user_net_worth_query_count(authenticated_client, db_session, query_counter):
+    """Regression: a user's snapshot costs the same queries however many assets they hold"""
+    from scheduler.scheduler_service import scheduler_service
+    
+    user_id = db_session.query(User).one().id
+    create_portfolio_with_assets(authenticated_client, "Stocks", [
+        (f"SYM{i}", "stock", "1", "10") for i in range(30)
+    ])
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': f"SYM{i}", 'asset_type': 'stock', 'price': Decimal("12"), 'source': 'alpha_vantage'}
+        for i in range(30)
+    ])
+    
+    query_counter.clear()
+    await scheduler_service.compute_user_net_worth(db_session, user_id)
+    
+    # portfolio totals, assets with prices, snapshot insert, item insert
+    assert len(query_counter) == 4
+    assert db_session.query(NetWorthSnapshot).one().total_value == Decimal("360")
+
+
+def test_current_networth_matches_snapshot_valuation(authenticated_client, db_session):
+    """Test /networth/current reports unpriced assets and the same total as snapshots"""
+    create_portfolio_with_assets(authenticated_client, "Mixed", [
+        ("AAPL", "stock", "10", "150"),
+        ("XYZ", "stock", "3", "20"),
+    ])
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'},
+    ])
+    
+    response = authenticated_client.get("/networth/current")
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert float(data["total_value"]) == 2000.0
+    assert data["last_updated"] is None
+    assets = {asset["symbol"]: asset for asset in data["portfolio_breakdown"]["Mixed"]["assets"]}
+    assert assets["AAPL"]["purchase_price"] == 150.0
+    assert assets["XYZ"]["current_price"] is None
+    assert assets["XYZ"]["current_value"] == 0.0
+
+
+def add_snapshots(db, user_id, points):
+    db.add_all([
+        NetWorthSnapshot(
+            user_id=user_id,
+            total_value=Decimal(value),
+            portfolio_breakdown={"Stocks": {"value": float(value), "assets": []}},
+            timestamp=timestamp
+        )
+        for timestamp, value in points
+    ])
+    db.commit()
+
+
+def test_networth_history_downsamples_to_last_value_per_bucket(authenticated_client, db_session):
+    """Test interval history keeps the last snapshot of each day within the range"""
+    from datetime import datetime
+    
+    user_id = db_session.query(User).one().id
+    add_snapshots(db_session, user_id, [
+        (datetime(2024, 3, 1, 2), "100"),
+        (datetime(2024, 3, 1, 14), "110"),
+        (datetime(2024, 3, 2, 2), "120"),
+        (datetime(2024, 3, 2, 9), "125"),
+        (datetime(2024, 3, 2, 20), "130"),
+        (datetime(2024, 3, 5, 2), "150"),
+    ])
+    
+    response = authenticated_client.get("/networth/history", params={
+        "start": "2024-03-01T00:00:00", "end": "2024-03-04T00:00:00", "interval": "1d", "include_breakdown": "true"
+    })
+    assert response.status_code == 200
+    history = response.json()["history"]
+    assert [Decimal(point["total_value"]) for point in history] == [Decimal("110"), Decimal("130")]
+    assert history[0]["portfolio_breakdown"] == {"Stocks": {"value": 110.0, "assets": []}}
+    
+    raw = authenticated_client.get("/networth/history", params={
+        "start": "2024-03-02T00:00:00", "end": "2024-03-06T00:00:00"
+    }).json()["history"]
+    assert [Decimal(point["total_value"]) for point in raw] == [Decimal("120"), Decimal("125"), Decimal("130"), Decimal("150")]
+    assert all(point["portfolio_breakdown"] is None for point in raw)
+    
+    monthly = authenticated_client.get("/networth/history", params={
+        "start": "2024-01-01T00:00:00", "end": "2024-12-31T00:00:00", "interval": "1M"
+    }).json()["history"]
+    assert [Decimal(point["total_value"]) for point in monthly] == [Decimal("150")]
+
+
+def test_networth_history_rejects_bad_ranges(authenticated_client):
+    """Test unknown intervals and inverted ranges are rejected"""
+    assert authenticated_client.get("/networth/history", params={"interval": "5m"}).status_code == 400
+    assert authenticated_client.get("/networth/history", params={
+        "start": "2024-03-05T00:00:00", "end": "2024-03-01T00:00:00"
+    }).status_code == 400
+
+
+def test_networth_history_reassembles_carried_forward_breakdowns(authenticated_client, db_session):
+    """Test carried-forward snapshots share their source's items and reassemble on request"""
+    create_portfolio_with_assets(authenticated_client, "Stocks", [("AAPL", "stock", "10", "150")])
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'}
+    ])
+    valuation_service.compute_all_user_valuations(db_session)
+    valuation_service.compute_all_user_valuations(db_session)
+    
+    first, carried = db_session.query(NetWorthSnapshot).order_by(NetWorthSnapshot.id).all()
+    assert carried.breakdown_snapshot_id == first.id
+    assert db_session.query(NetWorthSnapshotItem).count() == 2
+    
+    history = authenticated_client.get("/networth/history", params={"include_breakdown": "true"}).json()["history"]
+    assert len(history) == 2
+    assert history[0]["portfolio_breakdown"] == history[1]["portfolio_breakdown"] == {
+        "Stocks": {"value": 2000.0, "assets": [
+            {"symbol": "AAPL", "quantity": 10.0, "current_price": 200.0, "current_value": 2000.0}
+        ]}
+    }
+
+
+def test_snapshot_breakdowns_survive_portfolio_renames_and_deletions(authenticated_client, db_session):
+    """Test historical breakdowns keep the names and symbols recorded at snapshot time"""
+    stocks = create_portfolio_with_assets(authenticated_client, "Stocks", [("AAPL", "stock", "10", "150")])
+    crypto = create_portfolio_with_assets(authenticated_client, "Crypto", [("BTC", "crypto", "1", "40000")])
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'},
+        {'symbol': 'BTC', 'asset_type': 'crypto', 'price': Decimal("50000"), 'source': 'coingecko'},
+    ])
+    valuation_service.compute_all_user_valuations(db_session)
+    snapshot = db_session.query(NetWorthSnapshot).one()
+    
+    assert authenticated_client.put(f"/portfolios/{stocks}", json={"name": "Equities"}).status_code == 200
+    assert authenticated_client.delete(f"/portfolios/{crypto}").status_code == 200
+    
+    breakdown = valuation_service.snapshot_breakdowns(db_session, [snapshot.id])[snapshot.id]
+    assert breakdown == {
+        "Stocks": {"value": 2000.0, "assets": [
+            {"symbol": "AAPL", "quantity": 10.0, "current_price": 200.0, "current_value": 2000.0}
+        ]},
+        "Crypto": {"value": 50000.0, "assets": [
+            {"symbol": "BTC", "quantity": 1.0, "current_price": 50000.0, "current_value": 50000.0}
+        ]}
+    }
+
+
+def test_networth_summary_tracks_writes_and_prices(authenticated_client, db_session):
+    """Test stored portfolio valuations follow asset creation, price updates and deletion"""
+    stocks = create_portfolio_with_assets(authenticated_client, "Stocks", [
+        ("AAPL", "stock", "10", "150"),
+        ("MSFT", "stock", "5", "300"),
+    ])
+    crypto = create_portfolio_with_assets(authenticated_client, "Crypto", [])
+    
+    summary = authenticated_client.get("/networth/summary").json()
+    assert Decimal(summary["cost_basis"]) == Decimal("3000")
+    assert Decimal(summary["total_value"]) == Decimal("0")
+    assert [p["name"] for p in summary["portfolios"]] == ["Stocks", "Crypto"]
+    
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("200"), 'source': 'alpha_vantage'}
+    ])
+    summary = authenticated_client.get("/networth/summary").json()
+    assert Decimal(summary["portfolios"][0]["current_value"]) == Decimal("2000")
+    assert Decimal(summary["portfolios"][0]["gain_loss"]) == Decimal("-1000")
+    assert summary["portfolios"][0]["asset_count"] == 2
+    
+    create_portfolio_with_assets(authenticated_client, "More", [("AAPL", "stock", "1", "100")])
+    authenticated_client.delete(f"/portfolios/{crypto}")
+    summary = authenticated_client.get("/networth/summary").json()
+    assert [p["name"] for p in summary["portfolios"]] == ["Stocks", "More"]
+    assert Decimal(summary["total_value"]) == Decimal("2200")
+    assert Decimal(summary["cost_basis"]) == Decimal("3100")
+    assert summary["gain_loss_percent"] == pytest.approx(-29.03, abs=0.01)
+    
+    # The nightly valuation rewrites the same figures
+    valuation_service.compute_all_user_valuations(db_session)
+    revalued = authenticated_client.get("/networth/summary").json()
+    for portfolio in revalued["portfolios"] + summary["portfolios"]:
+        del portfolio["updated_at"]
+    assert revalued == summary
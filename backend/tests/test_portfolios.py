@@ -1,6 +1,9 @@
+import asyncio
+import httpx
 import pytest
 from datetime import datetime
 from decimal import Decimal
+from main import app
 
 
 def test_create_portfolio(authenticated_client):
@@ -97,3 +100,25 @@ def test_unauthorized_access(client):
     """Test accessing portfolios without authentication"""
     response = client.get("/portfolios/")
     assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_concurrent_portfolio_reads_share_the_event_loop(authenticated_client):
+    """Test async portfolio listings run side by side on async sessions"""
+    portfolio_id = authenticated_client.post("/portfolios/", json={"name": "Concurrent"}).json()["id"]
+    authenticated_client.post(f"/portfolios/{portfolio_id}/assets", json={
+        "symbol": "AAPL",
+        "name": "Apple Inc.",
+        "asset_type": "stock",
+        "quantity": "10",
+        "purchase_price": "150.00",
+        "purchase_date": "2024-01-15T10:30:00"
+    })
+    
+    async with httpx.AsyncClient(app=app, base_url="http://testserver", headers=authenticated_client.headers) as client:
+        responses = await asyncio.gather(*(client.get("/portfolios/") for _ in range(10)))
+    
+    for response in responses:
+        assert response.status_code == 200
+        assert [asset["symbol"] for asset in response.json()[0]["assets"]] == ["AAPL"]
+        assert Decimal(response.json()[0]["assets"][0]["purchase_price"]) == Decimal("150")
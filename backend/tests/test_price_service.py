@@ -0,0 +1,219 @@
+import pytest
+import asyncio
+import importlib
+import httpx
+from decimal import Decimal
+from models import PriceSnapshot, PriceRollup
+from services.price_service import PriceService, price_service
+from services.rate_limiter import RateLimiter, QuotaExceededError
+
+# The services package re-exports the price_service instance under the module's name
+price_service_module = importlib.import_module("services.price_service")
+
+
+def alpha_vantage_quote(symbol):
+    return {
+        "Global Quote": {
+            "01. symbol": symbol,
+            "05. price": "187.50",
+            "06. volume": "1000",
+            "09. change": "1.5",
+            "10. change percent": "0.8%"
+        }
+    }
+
+
+@pytest.fixture
+def price_service_factory(monkeypatch):
+    """Build a PriceService whose HTTP client is served by the given handler"""
+    def factory(handler):
+        service = PriceService()
+        service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        for provider in service.rate_limiters:
+            service.rate_limiters[provider] = RateLimiter(provider, rate_per_second=1000, burst=100)
+        return service
+    
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_fetch_stock_price_parses_quote(price_service_factory):
+    """Test stock quotes are fetched through the shared async client"""
+    async def handler(request):
+        assert request.url.params["symbol"] == "AAPL"
+        return httpx.Response(200, json=alpha_vantage_quote("AAPL"))
+    
+    service = price_service_factory(handler)
+    price_data = await service.fetch_price("AAPL", "stock")
+    await service.close()
+    
+    assert price_data["price"] == Decimal("187.50")
+    assert price_data["source"] == "alpha_vantage"
+
+
+@pytest.mark.asyncio
+async def test_fetches_respect_provider_concurrency(price_service_factory):
+    """Test concurrent fetches never exceed the provider's slot count"""
+    in_flight = 0
+    max_in_flight = 0
+    
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=alpha_vantage_quote(request.url.params["symbol"]))
+    
+    service = price_service_factory(handler)
+    service.provider_slots["alpha_vantage"] = asyncio.Semaphore(2)
+    
+    results = await asyncio.gather(*(service.fetch_price(f"SYM{i}", "stock") for i in range(8)))
+    await service.close()
+    
+    assert all(results)
+    assert max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_crypto_prices_batches_ids(price_service_factory, monkeypatch):
+    """Test crypto prices are fetched in URL-safe multi-id chunks and mapped back to symbols"""
+    monkeypatch.setattr(price_service_module, "COINGECKO_MAX_IDS_LENGTH", 20)
+    requested_ids = []
+    
+    async def handler(request):
+        ids = request.url.params["ids"].split(",")
+        requested_ids.append(ids)
+        return httpx.Response(200, json={crypto_id: {"usd": 2.5} for crypto_id in ids})
+    
+    service = price_service_factory(handler)
+    prices = await service.fetch_crypto_prices(["BTC", "eth", "SOL", "DOGE", "ADA"])
+    await service.close()
+    
+    assert set(prices) == {"BTC", "ETH", "SOL", "DOGE", "ADA"}
+    assert prices["DOGE"]["price"] == Decimal("2.5")
+    assert len(requested_ids) == 2
+    assert all(len(",".join(ids)) <= 20 for ids in requested_ids)
+
+
+@pytest.mark.asyncio
+async def test_throttled_request_is_retried_after_retry_after(price_service_factory):
+    """Test a 429 response pauses the provider and the request is retried"""
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(200, json=alpha_vantage_quote("AAPL"))
+    ]
+    
+    async def handler(request):
+        return responses.pop(0)
+    
+    service = price_service_factory(handler)
+    price_data = await service.fetch_stock_price("AAPL")
+    await service.close()
+    
+    assert price_data["price"] == Decimal("187.50")
+    assert responses == []
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_enforces_daily_quota():
+    """Test the limiter hands out its burst and stops at the daily quota"""
+    rate_limiter = RateLimiter("alpha_vantage", rate_per_second=1000, burst=3, daily_quota=3)
+    
+    for _ in range(3):
+        await rate_limiter.acquire()
+    
+    assert rate_limiter.remaining_quota == 0
+    with pytest.raises(QuotaExceededError):
+        await rate_limiter.acquire()
+
+
+def test_store_prices_bulk_inserts_all_snapshots(authenticated_client, db_session, query_counter):
+    """Test a whole refresh is written with one insert each for snapshots, latest prices, rollups and holder flags"""
+    portfolio_id = authenticated_client.post("/portfolios/", json={"name": "Crypto"}).json()["id"]
+    authenticated_client.post(f"/portfolios/{portfolio_id}/assets", json={
+        "symbol": "BTC",
+        "name": "Bitcoin",
+        "asset_type": "crypto",
+        "quantity": "1",
+        "purchase_price": "40000",
+        "purchase_date": "2024-01-15T10:30:00"
+    })
+    snapshots = [
+        {'symbol': f"SYM{i}", 'asset_type': 'stock', 'price': Decimal(i + 1), 'source': 'alpha_vantage'}
+        for i in range(20)
+    ]
+    snapshots.append({'symbol': 'BTC', 'asset_type': 'crypto', 'price': Decimal("45000"), 'source': 'coingecko'})
+    
+    query_counter.clear()
+    stored = price_service.store_prices_bulk(db_session, snapshots)
+    inserts = [statement for statement in query_counter if statement.startswith("INSERT")]
+    
+    assert stored == 21
+    assert len(inserts) == 4
+    assert db_session.query(PriceSnapshot).count() == 21
+    assert price_service.get_latest_price(db_session, "SYM19", "stock").price == Decimal("20")
+
+
+def price_row(symbol, price, timestamp):
+    return {'symbol': symbol, 'asset_type': 'stock', 'price': Decimal(price), 'timestamp': timestamp}
+
+
+def test_rollups_track_ohlc_across_batches(db_session):
+    """Test hourly and daily rollups fold prices from several ingest batches"""
+    from datetime import datetime
+    
+    price_service.upsert_rollups(db_session, [
+        price_row("AAPL", "100", datetime(2024, 3, 1, 9, 5)),
+        price_row("AAPL", "104", datetime(2024, 3, 1, 9, 40)),
+    ])
+    db_session.commit()
+    price_service.upsert_rollups(db_session, [
+        price_row("AAPL", "98", datetime(2024, 3, 1, 9, 55)),
+        price_row("AAPL", "101", datetime(2024, 3, 1, 15, 0)),
+    ])
+    db_session.commit()
+    
+    hourly = price_service.get_price_history(
+        db_session, "AAPL", "stock", "1h", datetime(2024, 3, 1), datetime(2024, 3, 2)
+    )
+    assert [(r.open, r.high, r.low, r.close, r.sample_count) for r in hourly] == [
+        (Decimal("100"), Decimal("104"), Decimal("98"), Decimal("98"), 3),
+        (Decimal("101"), Decimal("101"), Decimal("101"), Decimal("101"), 1),
+    ]
+    
+    daily = db_session.query(PriceRollup).filter(PriceRollup.interval == "day").one()
+    assert (daily.open, daily.high, daily.low, daily.close, daily.sample_count) == (
+        Decimal("100"), Decimal("104"), Decimal("98"), Decimal("101"), 4
+    )
+
+
+def test_price_history_endpoint_serves_rollups(authenticated_client, db_session):
+    """Test /prices/{symbol}/history returns daily buckets in range"""
+    from datetime import datetime
+    
+    price_service.upsert_rollups(db_session, [
+        price_row("AAPL", "100", datetime(2024, 3, 1, 9)),
+        price_row("AAPL", "110", datetime(2024, 3, 2, 9)),
+        price_row("AAPL", "120", datetime(2024, 3, 9, 9)),
+    ])
+    db_session.commit()
+    
+    response = authenticated_client.get("/prices/aapl/history", params={
+        "interval": "1d", "start": "2024-03-01T12:00:00", "end": "2024-03-05T00:00:00"
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["symbol"] == "AAPL"
+    assert [Decimal(point["close"]) for point in data["history"]] == [Decimal("100"), Decimal("110")]
+    
+    assert authenticated_client.get("/prices/AAPL/history", params={"interval": "5m"}).status_code == 400
+
+
+def test_store_prices_bulk_feeds_rollups(db_session):
+    """Test ingest updates the rollups in the same transaction"""
+    price_service.store_prices_bulk(db_session, [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("100"), 'source': 'alpha_vantage'}
+    ])
+    
+    assert db_session.query(PriceRollup).count() == 2
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from config import settings
+from models import User, PriceSnapshot, PriceRollup, NetWorthSnapshot, NetWorthSnapshotItem
+from services.price_service import price_service
+from services.retention_service import retention_service, add_months
+
+
+def test_add_months_crosses_years():
+    """Test month arithmetic used for partition bounds"""
+    from datetime import date
+    
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+
+
+def test_new_partitions_take_over_rows_from_the_default_partition():
+    """Test a monthly partition is attached only after its rows leave the default partition"""
+    from datetime import date
+    
+    class RecordingSession:
+        def __init__(self):
+            self.statements = []
+        
+        def execute(self, statement, params=None):
+            self.statements.append(" ".join(str(statement).split()))
+    
+    db = RecordingSession()
+    retention_service.create_partition(db, "price_snapshots", "price_snapshots_202412", date(2024, 12, 1))
+    
+    create, move, attach = db.statements
+    assert create == "CREATE TABLE price_snapshots_202412 (LIKE price_snapshots INCLUDING DEFAULTS)"
+    assert "DELETE FROM price_snapshots_default" in move and "INSERT INTO price_snapshots_202412" in move
+    assert attach == (
+        "ALTER TABLE price_snapshots ATTACH PARTITION price_snapshots_202412 "
+        "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+    )
+
+
+def test_ensure_current_partitions_is_a_no_op_without_partitioning(db_session):
+    """Test startup partition upkeep does nothing on databases without partitioned tables"""
+    assert retention_service.ensure_current_partitions(db_session) == []
+
+
+def test_retention_purges_old_prices_and_keeps_rollups(db_session):
+    """Test raw price snapshots past retention are removed while rollups remain"""
+    now = datetime(2024, 6, 30, 12)
+    old = now - timedelta(days=settings.price_snapshot_retention_days + 1)
+    rows = [
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("100"), 'currency': 'USD',
+         'timestamp': old, 'source': 'alpha_vantage', 'metadata': None},
+        {'symbol': 'AAPL', 'asset_type': 'stock', 'price': Decimal("110"), 'currency': 'USD',
+         'timestamp': now, 'source': 'alpha_vantage', 'metadata': None},
+    ]
+    db_session.execute(PriceSnapshot.__table__.insert(), rows)
+    price_service.upsert_rollups(db_session, rows)
+    db_session.commit()
+    
+    result = retention_service.apply_retention(db_session, now)
+    
+    assert result['purged_prices'] == 1
+    assert db_session.query(PriceSnapshot).one().price == Decimal("110")
+    assert db_session.query(PriceRollup).count() == 4
+
+
+def test_retention_thins_old_networth_snapshots_to_daily(client, db_session):
+    """Test old net worth snapshots keep only the last one per user per day"""
+    user = User(email="history@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    
+    now = datetime(2024, 6, 30, 12)
+    old_day = (now - timedelta(days=settings.networth_snapshot_compaction_days + 2)).replace(hour=0)
+    db_session.add_all([
+        NetWorthSnapshot(user_id=user.id, total_value=Decimal(value), portfolio_breakdown={}, timestamp=timestamp)
+        for timestamp, value in [
+            (old_day + timedelta(hours=2), "100"),
+            (old_day + timedelta(hours=14), "110"),
+            (now - timedelta(hours=3), "120"),
+            (now - timedelta(hours=1), "130"),
+        ]
+    ])
+    db_session.commit()
+    
+    result = retention_service.apply_retention(db_session, now)
+    
+    assert result['compacted_snapshots'] == 1
+    values = [s.total_value for s in db_session.query(NetWorthSnapshot).order_by(NetWorthSnapshot.timestamp)]
+    assert values == [Decimal("110"), Decimal("120"), Decimal("130")]
+
+
+def test_compaction_deletes_items_once_their_last_carried_copy_goes(client, db_session):
+    """Test shared items outlive their original snapshot only while a carried-forward copy points at them"""
+    user = User(email="items@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    
+    now = datetime(2024, 6, 30, 12)
+    old_day = (now - timedelta(days=settings.networth_snapshot_compaction_days + 2)).replace(hour=0)
+    original = NetWorthSnapshot(user_id=user.id, total_value=Decimal("100"), timestamp=old_day + timedelta(hours=1))
+    db_session.add(original)
+    db_session.flush()
+    db_session.add(NetWorthSnapshotItem(snapshot_id=original.id, portfolio_id=1, portfolio_name="Stocks", value=Decimal("100")))
+    db_session.add(NetWorthSnapshot(
+        user_id=user.id, total_value=Decimal("100"), breakdown_snapshot_id=original.id, timestamp=old_day + timedelta(hours=2)
+    ))
+    db_session.commit()
+    
+    # The original goes first; its copy still needs the items
+    assert retention_service.apply_retention(db_session, now)['compacted_snapshots'] == 1
+    assert db_session.query(NetWorthSnapshotItem).count() == 1
+    
+    # A later snapshot of the same day then compacts the copy away
+    db_session.add(NetWorthSnapshot(user_id=user.id, total_value=Decimal("120"), timestamp=old_day + timedelta(hours=3)))
+    db_session.commit()
+    assert retention_service.apply_retention(db_session, now)['compacted_snapshots'] == 1
+    
+    assert db_session.query(NetWorthSnapshot).one().total_value == Decimal("120")
+    assert db_session.query(NetWorthSnapshotItem).count() == 0
@@ -0,0 +1,126 @@
+from decimal import Decimal
+from services.price_service import price_service
+
+
+def stock_price(symbol, price):
+    return {'symbol': symbol, 'price': Decimal(price), 'currency': 'USD', 'source': 'alpha_vantage'}
+
+
+def add_holdings(client, db, portfolio_id, symbols):
+    """Add one stock per symbol with a stored price"""
+    for symbol in symbols:
+        asset_data = {
+            "symbol": symbol,
+            "name": f"{symbol} Inc.",
+            "asset_type": "stock",
+            "quantity": "2",
+            "purchase_price": "100.00",
+            "purchase_date": "2024-01-15T10:30:00"
+        }
+        response = client.post(f"/portfolios/{portfolio_id}/assets", json=asset_data)
+        assert response.status_code == 200
+        
+        price_service.store_price(db, "stock", stock_price(symbol, "120"))
+
+
+def test_get_latest_prices_returns_newest_snapshot(db_session):
+    """Test bulk latest price lookup picks the most recent stored price per key"""
+    price_service.store_price(db_session, "stock", stock_price("AAPL", "100"))
+    price_service.store_price(db_session, "stock", stock_price("AAPL", "110"))
+    price_service.store_price(db_session, "crypto", {
+        'symbol': 'BTC', 'price': Decimal("45000"), 'currency': 'USD', 'source': 'coingecko'
+    })
+    
+    prices = price_service.get_latest_prices(
+        db_session, [("AAPL", "stock"), ("BTC", "crypto"), ("MSFT", "stock")]
+    )
+    
+    assert prices[("AAPL", "stock")].price == Decimal("110")
+    assert prices[("BTC", "crypto")].price == Decimal("45000")
+    assert ("MSFT", "stock") not in prices
+    assert price_service.get_latest_price(db_session, "AAPL", "stock").price == Decimal("110")
+
+
+def test_store_price_invalidates_cached_price(db_session):
+    """Test a newly stored price replaces the cached one"""
+    price_service.store_price(db_session, "stock", stock_price("AAPL", "100"))
+    assert price_service.get_latest_price(db_session, "AAPL", "stock").price == Decimal("100")
+    
+    price_service.store_price(db_session, "stock", stock_price("AAPL", "105"))
+    
+    assert price_service.get_latest_price(db_session, "AAPL", "stock").price == Decimal("105")
+
+
+def test_price_read_before_store_is_not_cached(db_session):
+    """Test a reader that queried before a price update cannot cache the old price after it"""
+    price_service.store_price(db_session, "stock", stock_price("AAPL", "100"))
+    key = ("AAPL", "stock")
+    
+    # A reader misses the cache and queries the old price...
+    quotes, missing_keys = price_service._cached_quotes([key])
+    stale_prices = db_session.execute(price_service._latest_prices_query(missing_keys)).scalars().all()
+    db_session.expunge_all()
+    
+    # ...a new price is committed and invalidated before the reader caches its result
+    price_service.store_price(db_session, "stock", stock_price("AAPL", "105"))
+    assert price_service._cache_quotes(quotes, missing_keys, stale_prices)[key].price == Decimal("100")
+    
+    assert price_service.get_latest_price(db_session, "AAPL", "stock").price == Decimal("105")
+
+
+def test_portfolio_valuation_query_count_is_constant(authenticated_client, db_session, query_counter):
+    """Benchmark: valuing 1 or 50 holdings issues the same number of queries"""
+    portfolio_id = authenticated_client.post("/portfolios/", json={"name": "Benchmark"}).json()["id"]
+    
+    add_holdings(authenticated_client, db_session, portfolio_id, ["SYM0"])
+    query_counter.clear()
+    response = authenticated_client.get("/portfolios/")
+    assert response.status_code == 200
+    single_holding_queries = len(query_counter)
+    assert single_holding_queries > 0
+    
+    add_holdings(authenticated_client, db_session, portfolio_id, [f"SYM{i}" for i in range(1, 50)])
+    query_counter.clear()
+    response = authenticated_client.get("/portfolios/")
+    assert response.status_code == 200
+    assert len(response.json()[0]["assets"]) == 50
+    assert float(response.json()[0]["assets"][0]["current_value"]) == 240.0
+    
+    assert len(query_counter) == single_holding_queries
+
+
+def test_portfolio_listing_query_count_for_many_portfolios(authenticated_client, db_session, query_counter):
+    """Test listing 1, 10 and 100 portfolios loads them and their assets in the same number of queries"""
+    query_counts = []
+    portfolio_count = 0
+    
+    for target in (1, 10, 100):
+        while portfolio_count < target:
+            portfolio_id = authenticated_client.post("/portfolios/", json={"name": f"Portfolio {portfolio_count}"}).json()["id"]
+            add_holdings(authenticated_client, db_session, portfolio_id, ["AAPL"])
+            portfolio_count += 1
+        
+        # Keep price lookups out of the comparison so only ORM loading is measured
+        price_service.latest_price_cache.clear()
+        query_counter.clear()
+        response = authenticated_client.get("/portfolios/")
+        assert response.status_code == 200
+        assert len(response.json()) == target
+        query_counts.append(len(query_counter))
+    
+    assert query_counts[0] > 0
+    assert query_counts[0] == query_counts[1] == query_counts[2]
+
+
+def test_get_portfolio_returns_valued_assets(authenticated_client, db_session):
+    """Test a single portfolio is returned with valuation fields on its assets"""
+    portfolio_id = authenticated_client.post("/portfolios/", json={"name": "Single"}).json()["id"]
+    add_holdings(authenticated_client, db_session, portfolio_id, ["AAPL"])
+    
+    response = authenticated_client.get(f"/portfolios/{portfolio_id}")
+    assert response.status_code == 200
+    
+    asset = response.json()["assets"][0]
+    assert float(asset["purchase_price"]) == 100.0
+    assert float(asset["current_price"]) == 120.0
+    assert float(asset["current_value"]) == 240.0
@@ -3,9 +3,10 @@ from .auth import (
     verify_token, get_current_user, authenticate_user
 )
 from .encryption import encryption
+from .cache import TTLCache, MISSING
 
 __all__ = [
     "verify_password", "get_password_hash", "create_access_token",
     "verify_token", "get_current_user", "authenticate_user",
-    "encryption"
+    "encryption", "TTLCache", "MISSING"
 ]
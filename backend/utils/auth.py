@@ -4,9 +4,10 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from config import settings
-from database import get_db
+from database import get_db, get_async_db
 from models import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -45,12 +46,8 @@ def verify_token(token: str) -> dict:
         )
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    token = credentials.credentials
-    payload = verify_token(token)
+def user_id_from_credentials(credentials: HTTPAuthorizationCredentials) -> int:
+    payload = verify_token(credentials.credentials)
     
     user_id: int = payload.get("sub")
     if user_id is None:
@@ -59,16 +56,35 @@ async def get_current_user(
             detail="Could not validate credentials",
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # asyncpg binds parameters strictly, and the token carries the id as a string
+    return int(user_id)
+
+
+def ensure_user(user: Optional[User]) -> User:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
-    
     return user
 
 
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    # Shares the route's request-scoped session, so sync routes hold a single connection
+    return ensure_user(db.get(User, user_id_from_credentials(credentials)))
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """get_current_user for async routes, on their AsyncSession"""
+    return ensure_user(await db.get(User, user_id_from_credentials(credentials)))
+
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     user = db.query(User).filter(User.email == email).first()
     if not user:
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+import time
+
+# Returned by TTLCache.get when a key is absent, so cached None values stay distinguishable
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional per-entry time-to-live"""
+    
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None, timer: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Bumped by invalidate; keys never invalidated are at generation 0
+        self._generations: Dict[Hashable, int] = {}
+        self._lock = Lock()
+    
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return a cached value, or default if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.timer():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            
+            self.misses += 1
+            return default
+    
+    def generation(self, key: Hashable) -> int:
+        """Current generation of a key, to pass to set once its value has been loaded"""
+        with self._lock:
+            return self._generations.get(key, 0)
+    
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Store a value, evicting the least recently used entry when full.
+        
+        With a generation, the value is dropped if the key was invalidated since
+        that generation was read, as it may have been loaded before the change.
+        """
+        if self.max_size <= 0:
+            return
+        
+        expires_at = self.timer() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if generation is not None and self._generations.get(key, 0) != generation:
+                return
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry if present and reject values loaded before now"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+    
+    def clear(self) -> None:
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
@@ -1,23 +1,45 @@
 from cryptography.fernet import Fernet
 from config import settings
+from utils.cache import TTLCache, MISSING
 import base64
 
+# Current ciphertext format: this prefix followed by the raw (already urlsafe-base64) Fernet token.
+# "$" is outside both base64 alphabets, so legacy base64-wrapped tokens can never start with it.
+CIPHERTEXT_V2_PREFIX = "$2"
+
 
 class AESEncryption:
     def __init__(self):
         # Use Fernet which provides AES-256 encryption
         self.cipher = Fernet(base64.urlsafe_b64encode(settings.encryption_key_bytes))
+        # Ciphertexts are immutable, so their plaintexts can be cached without expiry
+        self.decrypt_cache = TTLCache(max_size=settings.decrypt_cache_max_size)
     
     def encrypt(self, data: str) -> str:
-        """Encrypt a string and return base64 encoded result"""
-        encrypted_data = self.cipher.encrypt(data.encode())
-        return base64.b64encode(encrypted_data).decode()
+        """Encrypt a string into the versioned ciphertext format"""
+        encrypted_data = CIPHERTEXT_V2_PREFIX + self.cipher.encrypt(data.encode()).decode()
+        self.decrypt_cache.set(encrypted_data, data)
+        return encrypted_data
     
     def decrypt(self, encrypted_data: str) -> str:
-        """Decrypt base64 encoded encrypted data"""
-        decoded_data = base64.b64decode(encrypted_data.encode())
-        decrypted_data = self.cipher.decrypt(decoded_data)
-        return decrypted_data.decode()
+        """Decrypt data in either the versioned or the legacy base64-wrapped format"""
+        decrypted = self.decrypt_cache.get(encrypted_data)
+        if decrypted is MISSING:
+            if encrypted_data.startswith(CIPHERTEXT_V2_PREFIX):
+                token = encrypted_data[len(CIPHERTEXT_V2_PREFIX):].encode()
+            else:
+                token = base64.b64decode(encrypted_data.encode())
+            decrypted = self.cipher.decrypt(token).decode()
+            self.decrypt_cache.set(encrypted_data, decrypted)
+        return decrypted
+    
+    def needs_reencryption(self, encrypted_data: str) -> bool:
+        """Whether a ciphertext is still in the legacy base64-wrapped format"""
+        return not encrypted_data.startswith(CIPHERTEXT_V2_PREFIX)
+    
+    def clear_cache(self):
+        """Drop cached plaintexts, e.g. after rotating the encryption key"""
+        self.decrypt_cache.clear()
 
 
 # Global instance